@@ -95,9 +95,10 @@ class PaginatedResponse(BaseModel):
     """分页响应模型"""
     items: List[Any]
     total: int
-    page: int
+    page: Optional[int] = None  # 按游标翻页时为空
     page_size: int
     total_pages: int
+    next_cursor: Optional[Dict[str, Any]] = None  # 下一页游标，末页为空
 
 
 class ErrorResponse(BaseModel):
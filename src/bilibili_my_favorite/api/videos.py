@@ -22,7 +22,9 @@ async def get_videos_by_collection(
     status: Optional[str] = Query("all", pattern="^(all|available|deleted)$", description="视频状态过滤"),
     search: Optional[str] = Query(None, min_length=1, max_length=100, description="搜索关键词"),
     page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(20, ge=1, le=100, description="每页数量")
+    page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    after_fav_time: Optional[int] = Query(None, description="游标：上一页最后一个视频的收藏时间"),
+    after_video_id: Optional[int] = Query(None, description="游标：上一页最后一个视频的ID")
 ):
     """
     获取指定收藏夹中的视频列表
@@ -31,6 +33,7 @@ async def get_videos_by_collection(
     - search: 在视频标题和UP主名称中搜索
     - page: 页码，从1开始
     - page_size: 每页视频数量，最大100
+    - after_fav_time/after_video_id: 传入上一页返回的 next_cursor 时按游标翻页，忽略 page
     """
     try:
         # 检查收藏夹是否存在
@@ -41,30 +44,28 @@ async def get_videos_by_collection(
         # 计算偏移量
         offset = (page - 1) * page_size
         
-        # 获取视频列表
-        videos = await video_dao.get_videos_by_collection(
+        # 获取视频列表，总数随同一条查询返回
+        result = await video_dao.get_collection_page(
             collection_id=collection_id,
             status=status,
             search=search,
             limit=page_size,
-            offset=offset
+            offset=offset,
+            after_fav_time=after_fav_time,
+            after_video_id=after_video_id
         )
-        
-        # 获取总数（为了分页信息，需要单独查询）
-        total_videos = await video_dao.get_videos_by_collection(
-            collection_id=collection_id,
-            status=status,
-            search=search
-        )
-        total = len(total_videos)
+        videos = result["items"]
+        total = result["total"]
         total_pages = math.ceil(total / page_size) if total > 0 else 1
         
         return PaginatedResponse(
             items=videos,
             total=total,
-            page=page,
+            # 按游标翻页时 page 参数被忽略，不回显
+            page=page if after_video_id is None else None,
             page_size=page_size,
-            total_pages=total_pages
+            total_pages=total_pages,
+            next_cursor=video_dao.next_cursor(videos, page_size)
         )
         
     except HTTPException:
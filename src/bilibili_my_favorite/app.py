@@ -239,8 +239,9 @@ async def get_global_stats() -> GlobalStatsDict:
         available_videos = 0
         deleted_videos = 0
         
-        for collection in collections:
-            stats = await collection_dao.get_collection_stats(collection["id"])
+        # 各收藏夹的统计在只读连接上并发查询
+        all_stats = await collection_dao.get_collections_stats([c["id"] for c in collections])
+        for stats in all_stats.values():
             total_videos += stats.get("total_videos", 0)
             available_videos += stats.get("available_videos", 0)
             deleted_videos += stats.get("deleted_videos", 0)
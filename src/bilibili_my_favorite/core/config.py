@@ -3,7 +3,7 @@
 统一管理应用程序的所有配置项
 """
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -19,6 +19,10 @@ class Config(BaseSettings):
 
     # 数据库配置
     DATABASE_PATH: Optional[Path] = "./bilibili_favorites.db"
+    DB_READER_COUNT: int = 4  # 只读连接数，0 表示读写共用一个连接
+    DB_SYNCHRONOUS: Literal["NORMAL", "FULL"] = "NORMAL"  # WAL下NORMAL不会损坏数据库，FULL每次提交都fsync
+    DB_CACHE_SIZE_KB: int = 65536  # 每个连接的页缓存大小（KB）
+    DB_BUSY_TIMEOUT_MS: int = 30000  # 数据库被其他连接池（如任务执行器线程）写锁定时的最长等待时间（毫秒）
 
     # 文件存储配置
     COVERS_DIR: Optional[Path] = "./covers"
@@ -47,7 +51,19 @@ class Config(BaseSettings):
     # 下载配置
     DOWNLOAD_TIMEOUT: int = 10
     MAX_PAGES_PER_COLLECTION: int = 100
-    REQUEST_DELAY: int = 500 # ms
+    REQUEST_DELAY: int = 500 # ms，相邻B站接口请求的最小间隔
+    REQUEST_DELAY_MAX: int = 3000  # ms，相邻请求的最大间隔，实际间隔在两者之间随机
+    REQUEST_BURST: int = 1  # 请求限流允许的突发请求数，调大会提高被B站限流（-412）的风险
+    MAX_CONCURRENT_FAVORITES: int = 3  # 批量获取时同时请求的收藏夹数量
+    MAX_CONCURRENT_PAGES: int = 4  # 同步时单个收藏夹同时请求的页数
+    MAX_CONCURRENT_COLLECTIONS: int = 3  # 同步时同时获取的收藏夹数量
+    COVER_DOWNLOAD_CONCURRENCY: int = 8  # 同时下载的封面数量
+    API_MAX_RETRIES: int = 5  # B站接口遇到网络错误或限流时的最大尝试次数
+    API_RETRY_BASE_DELAY: float = 0.5  # 重试退避的基础等待秒数，每次翻倍
+    # 增量同步：只获取比库中最新收藏时间更新的分页。较早分页中失效或被取消收藏的视频无法检测，
+    # 因此距上次完整同步超过 SYNC_FULL_INTERVAL_DAYS 天的收藏夹仍会完整同步一次
+    SYNC_INCREMENTAL: bool = False
+    SYNC_FULL_INTERVAL_DAYS: int = 7  # 增量同步时强制完整同步的间隔（天），0 表示每次都完整同步
 
     # 日志配置
     LOG_LEVEL: str = "INFO"
@@ -0,0 +1,137 @@
+"""
+SQLite 连接池
+一个写连接 + 若干只读连接，连接在事件循环内复用，避免每次调用都重新建立连接
+"""
+import asyncio
+import aiosqlite
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from .config import config
+from ..utils.logger import logger
+
+
+# 每个连接缓存的预编译语句数量（sqlite3 默认 128）
+STATEMENT_CACHE_SIZE = 1024
+
+
+async def apply_pragmas(connection: aiosqlite.Connection, read_only: bool = False):
+    """一次下发连接的性能相关PRAGMA"""
+    pragmas = [
+        # 每个事件循环各有一个写连接，写锁只在循环内互斥，跨循环的写入靠SQLite的忙等待排队；
+        # 最先设置，切换WAL模式时也能等待
+        f"PRAGMA busy_timeout={config.DB_BUSY_TIMEOUT_MS}",
+        "PRAGMA journal_mode=WAL",  # 启用WAL模式
+        f"PRAGMA synchronous={config.DB_SYNCHRONOUS}",  # 默认NORMAL平衡性能和安全
+        f"PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}",  # 负数表示以KB为单位
+        "PRAGMA temp_store=MEMORY",  # 临时表存储在内存
+        "PRAGMA mmap_size=268435456",  # 256MB内存映射
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")  # 只读连接禁止写入
+    await connection.executescript(";\n".join(pragmas) + ";")
+
+
+class AsyncSQLitePool:
+    """单个事件循环使用的 SQLite 连接池"""
+
+    def __init__(self, db_path: Path, reader_count: int = 4):
+        self.db_path = db_path
+        self.reader_count = reader_count
+        self.writer: Optional[aiosqlite.Connection] = None
+        self.readers: List[aiosqlite.Connection] = []
+        self.write_lock = asyncio.Lock()
+        self._reader_queue: asyncio.Queue = asyncio.Queue()
+
+    async def open(self):
+        """打开写连接和只读连接"""
+        try:
+            self.writer = await self._connect()
+
+            # WAL模式下读连接互不阻塞，也不会被写事务阻塞
+            for _ in range(self.reader_count):
+                reader = await self._connect(read_only=True)
+                self.readers.append(reader)
+                self._reader_queue.put_nowait(reader)
+        except Exception:
+            await self.close()
+            raise
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        """打开一个连接并应用性能相关的PRAGMA"""
+        # sqlite3 按SQL文本缓存已编译的语句，调大缓存让同步时的热点语句不必反复 prepare
+        connection = await aiosqlite.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+        connection.row_factory = aiosqlite.Row
+
+        await apply_pragmas(connection, read_only)
+        return connection
+
+    async def close(self):
+        """关闭所有连接"""
+        connections = [*self.readers, self.writer] if self.writer else list(self.readers)
+        for connection in connections:
+            try:
+                await connection.close()
+            except Exception as e:
+                logger.error(f"关闭数据库连接时出错: {e}")
+        self.writer = None
+        self.readers = []
+
+    @asynccontextmanager
+    async def acquire_reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个只读连接，未配置只读连接时使用写连接"""
+        if not self.readers:
+            yield self.writer
+            return
+
+        connection = await self._reader_queue.get()
+        try:
+            yield connection
+        finally:
+            self._reader_queue.put_nowait(connection)
+
+    @asynccontextmanager
+    async def acquire_writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """在写锁内借出写连接"""
+        async with self.write_lock:
+            yield self.writer
+
+
+# asyncio 的锁和队列只能在创建它们的事件循环中使用，任务执行器运行在独立线程的事件循环中，
+# 因此每个事件循环各自持有一个连接池
+_pools: Dict[asyncio.AbstractEventLoop, AsyncSQLitePool] = {}
+
+
+def get_current_pool() -> Optional[AsyncSQLitePool]:
+    """获取当前事件循环已打开的连接池"""
+    try:
+        return _pools.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return None
+
+
+async def get_pool() -> AsyncSQLitePool:
+    """获取当前事件循环的连接池，首次使用时打开"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = AsyncSQLitePool(config.DATABASE_PATH, config.DB_READER_COUNT)
+        await pool.open()
+        # 并发首次调用时只保留一个连接池
+        existing = _pools.setdefault(loop, pool)
+        if existing is not pool:
+            await pool.close()
+            return existing
+        logger.info(f"数据库连接池已打开，启用WAL模式和性能优化，只读连接数: {len(pool.readers)}")
+    return pool
+
+
+async def close_pool() -> bool:
+    """关闭当前事件循环的连接池，返回是否存在已打开的连接池"""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is None:
+        return False
+    await pool.close()
+    logger.info("数据库连接池已关闭")
+    return True
@@ -2,19 +2,22 @@
 数据访问层基类
 提供通用的数据库操作方法
 """
+import asyncio
 import aiosqlite
 import traceback
-from typing import Optional, Dict, Any, List, ClassVar
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Dict, Any, List, ClassVar
 from ..core.config import config
+from ..core.db_pool import AsyncSQLitePool, get_pool, get_current_pool, close_pool
+from ..models.database_migration import check_migration_needed, migrate_database
 from ..utils.logger import logger
 
 
 class DatabaseManager:
-    """数据库连接管理器 - 单例模式"""
+    """数据库连接管理器 - 单例模式，连接由当前事件循环的连接池提供"""
     
     _instance: Optional['DatabaseManager'] = None
-    _connection: Optional[aiosqlite.Connection] = None
-    _initialized: bool = False
     
     def __new__(cls):
         if cls._instance is None:
@@ -22,47 +25,61 @@ class DatabaseManager:
         return cls._instance
     
     async def initialize(self):
-        """初始化数据库连接"""
-        if self._initialized:
+        """初始化当前事件循环的数据库连接池"""
+        if get_current_pool():
             return
         
         try:
-            self._connection = await aiosqlite.connect(config.DATABASE_PATH)
-            self._connection.row_factory = aiosqlite.Row
-            
-            # 优化SQLite配置
-            await self._connection.execute("PRAGMA journal_mode=WAL")  # 启用WAL模式
-            await self._connection.execute("PRAGMA synchronous=NORMAL")  # 平衡性能和安全
-            await self._connection.execute("PRAGMA cache_size=10000")  # 增加缓存
-            await self._connection.execute("PRAGMA temp_store=MEMORY")  # 临时表存储在内存
-            await self._connection.execute("PRAGMA mmap_size=268435456")  # 256MB内存映射
-            await self._connection.commit()
-            
-            self._initialized = True
-            logger.info("数据库连接已初始化，启用WAL模式和性能优化")
-            
+            # 补齐已有数据库缺失的结构，已是最新版本时只做一次版本检查
+            if await check_migration_needed():
+                await migrate_database()
+            await get_pool()
         except Exception as e:
             logger.error(f"数据库初始化失败: {e}")
             raise
     
     async def close(self):
-        """关闭数据库连接"""
-        if self._connection:
-            try:
-                await self._connection.close()
-                logger.info("数据库连接已关闭")
-            except Exception as e:
-                logger.error(f"关闭数据库连接时出错: {e}")
-            finally:
-                self._connection = None
-                self._initialized = False
+        """关闭当前事件循环的数据库连接池"""
+        await close_pool()
+    
+    def _current(self) -> AsyncSQLitePool:
+        """获取当前事件循环的连接池"""
+        pool = get_current_pool()
+        if pool is None:
+            raise RuntimeError("数据库未初始化，请先调用 initialize()")
+        return pool
     
     @property
     def connection(self) -> aiosqlite.Connection:
-        """获取数据库连接"""
-        if not self._initialized or not self._connection:
-            raise RuntimeError("数据库未初始化，请先调用 initialize()")
-        return self._connection
+        """获取数据库写连接"""
+        return self._current().writer
+    
+    @property
+    def write_lock(self) -> asyncio.Lock:
+        """获取写锁，保证同一时刻只有一个写事务"""
+        return self._current().write_lock
+    
+    def reader(self):
+        """借出一个只读连接"""
+        return self._current().acquire_reader()
+
+
+class Transaction:
+    """写事务句柄，提供本事务统一使用的时间戳，其余属性委托给底层连接"""
+    
+    def __init__(self, connection: aiosqlite.Connection):
+        self.connection = connection
+        self._now: Optional[datetime] = None
+    
+    @property
+    def now(self) -> datetime:
+        """本事务的当前时间（UTC），首次访问时取值，同一事务内保持一致"""
+        if self._now is None:
+            self._now = datetime.now(timezone.utc)
+        return self._now
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.connection, name)
 
 
 class BaseDAO:
@@ -92,8 +109,9 @@ class BaseDAO:
     async def execute_query(self, query: str, params: tuple = ()) -> List[aiosqlite.Row]:
         """执行查询并返回结果"""
         try:
-            cursor = await self.db.execute(query, params)
-            return await cursor.fetchall()
+            async with self._db_manager.reader() as connection:
+                # execute 与 fetchall 在工作线程中一次完成，只跨一次线程
+                return await connection.execute_fetchall(query, params)
         except Exception as e:
             error_traceback = traceback.format_exc()
             logger.error(f"执行查询失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
@@ -102,8 +120,9 @@ class BaseDAO:
     async def execute_one(self, query: str, params: tuple = ()) -> Optional[aiosqlite.Row]:
         """执行查询并返回单个结果"""
         try:
-            cursor = await self.db.execute(query, params)
-            return await cursor.fetchone()
+            async with self._db_manager.reader() as connection:
+                cursor = await connection.execute(query, params)
+                return await cursor.fetchone()
         except Exception as e:
             error_traceback = traceback.format_exc()
             logger.error(f"执行单条查询失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
@@ -111,50 +130,78 @@ class BaseDAO:
     
     async def execute_insert(self, query: str, params: tuple = ()) -> int:
         """执行插入操作并返回新记录ID"""
-        try:
-            cursor = await self.db.execute(query, params)
-            await self.db.commit()
-            return cursor.lastrowid
-        except Exception as e:
-            error_traceback = traceback.format_exc()
-            logger.error(f"执行插入失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
-            await self.db.rollback()
-            raise
+        async with self._db_manager.write_lock:
+            try:
+                cursor = await self.db.execute(query, params)
+                await self.db.commit()
+                return cursor.lastrowid
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"执行插入失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
+    
+    async def execute_returning(self, query: str, params: tuple = ()) -> Optional[aiosqlite.Row]:
+        """执行带 RETURNING 子句的写操作并返回第一行结果"""
+        async with self._db_manager.write_lock:
+            try:
+                rows = await self.db.execute_fetchall(query, params)
+                await self.db.commit()
+                return rows[0] if rows else None
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"执行写入失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
     
     async def execute_update(self, query: str, params: tuple = ()) -> int:
         """执行更新操作并返回影响的行数"""
-        try:
-            cursor = await self.db.execute(query, params)
-            await self.db.commit()
-            return cursor.rowcount
-        except Exception as e:
-            error_traceback = traceback.format_exc()
-            logger.error(f"执行更新失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
-            await self.db.rollback()
-            raise
+        async with self._db_manager.write_lock:
+            try:
+                cursor = await self.db.execute(query, params)
+                await self.db.commit()
+                return cursor.rowcount
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"执行更新失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
     
     async def execute_delete(self, query: str, params: tuple = ()) -> int:
         """执行删除操作并返回影响的行数"""
-        try:
-            cursor = await self.db.execute(query, params)
-            await self.db.commit()
-            return cursor.rowcount
-        except Exception as e:
-            error_traceback = traceback.format_exc()
-            logger.error(f"执行删除失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
-            await self.db.rollback()
-            raise
+        async with self._db_manager.write_lock:
+            try:
+                cursor = await self.db.execute(query, params)
+                await self.db.commit()
+                return cursor.rowcount
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"执行删除失败: {query}, 参数: {params}, 错误: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
     
     async def execute_batch(self, query: str, params_list: List[tuple]) -> None:
         """批量执行操作"""
-        try:
-            await self.db.executemany(query, params_list)
-            await self.db.commit()
-        except Exception as e:
-            error_traceback = traceback.format_exc()
-            logger.error(f"批量执行失败: {query}, 错误: {e}\n错误栈:\n{error_traceback}")
-            await self.db.rollback()
-            raise
+        async with self._db_manager.write_lock:
+            try:
+                await self.db.executemany(query, params_list)
+                await self.db.commit()
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"批量执行失败: {query}, 错误: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
+    
+    async def execute_script(self, script: str) -> None:
+        """执行多条以分号分隔的SQL语句（脚本内不能使用参数）"""
+        async with self._db_manager.write_lock:
+            try:
+                await self.db.executescript(script)
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"执行SQL脚本失败: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
     
     async def execute_transaction(self, operations: List[tuple]) -> None:
         """执行事务操作
@@ -162,15 +209,30 @@ class BaseDAO:
         Args:
             operations: 操作列表，每个元素为 (query, params) 元组
         """
-        try:
-            for query, params in operations:
-                await self.db.execute(query, params)
-            await self.db.commit()
-        except Exception as e:
-            error_traceback = traceback.format_exc()
-            logger.error(f"事务执行失败: {e}\n错误栈:\n{error_traceback}")
-            await self.db.rollback()
-            raise
+        async with self._db_manager.write_lock:
+            try:
+                for query, params in operations:
+                    await self.db.execute(query, params)
+                await self.db.commit()
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"事务执行失败: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
+    
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Transaction]:
+        """在写锁内开启 BEGIN IMMEDIATE 事务，正常退出时提交，异常时回滚"""
+        async with self._db_manager.write_lock:
+            await self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield Transaction(self.db)
+                await self.db.commit()
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"事务执行失败: {e}\n错误栈:\n{error_traceback}")
+                await self.db.rollback()
+                raise
     
     def row_to_dict(self, row: Optional[aiosqlite.Row]) -> Optional[Dict[str, Any]]:
         """将数据库行转换为字典"""
@@ -178,4 +240,8 @@ class BaseDAO:
     
     def rows_to_dicts(self, rows: List[aiosqlite.Row]) -> List[Dict[str, Any]]:
         """将数据库行列表转换为字典列表"""
-        return [dict(row) for row in rows] 
\ No newline at end of file
+        if not rows:
+            return []
+        # 同一结果集的列名相同，只取一次后按位置组装，比逐行 dict(row) 查列名快数倍
+        keys = rows[0].keys()
+        return [dict(zip(keys, row)) for row in rows]
@@ -2,9 +2,13 @@
 收藏夹数据访问对象
 提供收藏夹相关的数据库操作
 """
+import asyncio
+import time
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 from .base import BaseDAO
+from .video_dao import VideoDAO
+from ..models.database import to_timestamp_text
 from ..utils.logger import logger
 
 
@@ -50,10 +54,24 @@ class CollectionDAO(BaseDAO):
         row = await self.execute_one(query, (bilibili_fid,))
         return self.row_to_dict(row)
     
+    async def get_incremental_cursor(self, bilibili_fid: str, full_sync_interval: int) -> Optional[int]:
+        """获取增量同步的游标：B站收藏夹在库中最新的收藏时间
+        
+        从未完整同步过，或距上次完整同步已超过 full_sync_interval 秒时返回 None，需要完整同步
+        """
+        query = """
+        SELECT MAX(cv.fav_time)
+        FROM collections c
+        JOIN collection_videos cv ON cv.collection_id = c.id
+        WHERE c.bilibili_fid = ? AND c.last_full_sync >= ?
+        """
+        row = await self.execute_one(query, (bilibili_fid, int(time.time()) - full_sync_interval))
+        return row[0] if row else None
+    
     async def create_collection(self, bilibili_fid: str, title: str, user_mid: str,
                               description: str = None, cover_url: str = None) -> int:
         """创建新收藏夹"""
-        now = datetime.now(timezone.utc)
+        now = to_timestamp_text(datetime.now(timezone.utc))
         query = """
         INSERT INTO collections (bilibili_fid, title, user_mid, description, cover_url, 
                                created_at, updated_at, last_synced)
@@ -67,7 +85,7 @@ class CollectionDAO(BaseDAO):
                               description: str = None, cover_url: str = None,
                               media_count: int = None) -> int:
         """更新收藏夹信息"""
-        now = datetime.now(timezone.utc)
+        now = to_timestamp_text(datetime.now(timezone.utc))
         
         # 构建动态更新查询
         update_fields = []
@@ -93,16 +111,29 @@ class CollectionDAO(BaseDAO):
         query = f"UPDATE collections SET {', '.join(update_fields)} WHERE id = ?"
         return await self.execute_update(query, tuple(params))
     
-    async def update_sync_time(self, collection_id: int) -> int:
-        """更新收藏夹同步时间"""
+    async def update_sync_time(self, collection_id: int, full_sync: bool = False) -> int:
+        """更新收藏夹同步时间，完整同步（检测过取消收藏的视频）时同时记录完整同步时间"""
         now = datetime.now(timezone.utc)
-        query = "UPDATE collections SET last_synced = ?, updated_at = ? WHERE id = ?"
-        return await self.execute_update(query, (now, now, collection_id))
+        query = """
+        UPDATE collections
+        SET last_synced = ?, updated_at = ?, last_full_sync = CASE WHEN ? THEN ? ELSE last_full_sync END
+        WHERE id = ?
+        """
+        # last_synced 沿用 TIMESTAMP 文本格式，last_full_sync 为秒级时间戳
+        now_text = to_timestamp_text(now)
+        rowcount = await self.execute_update(
+            query, (now_text, now_text, full_sync, int(now.timestamp()), collection_id)
+        )
+        # 同步完成后使视频相关的读缓存失效
+        VideoDAO.invalidate_cache()
+        return rowcount
     
     async def delete_collection(self, collection_id: int) -> int:
         """删除收藏夹"""
         query = "DELETE FROM collections WHERE id = ?"
-        return await self.execute_delete(query, (collection_id,))
+        rowcount = await self.execute_delete(query, (collection_id,))
+        VideoDAO.invalidate_cache()
+        return rowcount
     
     async def get_collection_stats(self, collection_id: int) -> Dict[str, Any]:
         """获取收藏夹统计信息"""
@@ -121,6 +152,13 @@ class CollectionDAO(BaseDAO):
             'total_videos': 0, 'available_videos': 0, 
             'deleted_videos': 0, 'last_video_seen': None
         }
+    
+    async def get_collections_stats(self, collection_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """并发获取多个收藏夹的统计信息，每个查询占用一个只读连接"""
+        results = await asyncio.gather(
+            *(self.get_collection_stats(collection_id) for collection_id in collection_ids)
+        )
+        return dict(zip(collection_ids, results))
 
 
 # 创建全局实例
@@ -2,18 +2,79 @@
 任务数据访问层
 处理任务的数据库操作
 """
+import copy
 import json
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Tuple
 
 from .base import BaseDAO
-from ..models.task_models import BaseTask, TaskStatus, TaskType
+from ..models.task_models import BaseTask, TaskProgress, TaskResult, TaskStatus, TaskType
 from ..utils.logger import logger
 
 
+def _to_millis(value: Optional[datetime]) -> Optional[int]:
+    """datetime 转为毫秒时间戳（朴素时间按本地时间处理）"""
+    return int(value.timestamp() * 1000) if value else None
+
+
+def _now_ms() -> int:
+    """当前时间的毫秒时间戳"""
+    return time.time_ns() // 1_000_000
+
+
+# 需要调度器频繁轮询的活跃状态
+ACTIVE_STATUSES = (TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.PAUSED)
+
+
 class TaskDAO(BaseDAO):
     """任务数据访问对象"""
     
+    def __init__(self):
+        super().__init__()
+        # 活跃任务的内存副本及其写入数据库时的 updated_at，保存成功后写穿更新；
+        # 调度轮询先用一条聚合查询确认数据库中的活跃任务没有被其他进程改动，再直接读内存
+        self._active: Dict[str, Tuple[int, BaseTask]] = {}
+        self._cache_warmed = False
+    
+    async def warm_cache(self):
+        """从数据库加载活跃任务到内存"""
+        query = """
+        SELECT * FROM tasks 
+        WHERE status IN ('pending', 'running', 'paused')
+        """
+        rows = await self.execute_query(query)
+        self._active = {row["task_id"]: (row["updated_at"], self._row_to_task(row)) for row in rows}
+        self._cache_warmed = True
+        logger.info(f"已加载 {len(self._active)} 个活跃任务到内存")
+    
+    async def _ensure_cache_fresh(self):
+        """活跃任务的数量或最近更新时间与内存不一致时（如CLI等其他进程写入了任务），重新从数据库加载"""
+        if self._cache_warmed:
+            query = """
+            SELECT COUNT(*), MAX(updated_at) FROM tasks
+            WHERE status IN ('pending', 'running', 'paused')
+            """
+            rows = await self.execute_query(query)
+            count, latest = rows[0]
+            cached = list(self._active.values())
+            if count == len(cached) and latest == max((updated_at for updated_at, _ in cached), default=None):
+                return
+        await self.warm_cache()
+    
+    def _update_cache(self, task: BaseTask, updated_at: int):
+        """保存成功后同步内存中的活跃任务，保存的是副本，调用方之后对任务的修改不会影响缓存"""
+        if task.status in ACTIVE_STATUSES:
+            self._active[task.task_id] = (updated_at, copy.deepcopy(task))
+        else:
+            self._active.pop(task.task_id, None)
+    
+    def _cached_active_tasks(self, statuses=ACTIVE_STATUSES) -> List[BaseTask]:
+        """按优先级降序、创建时间升序返回内存中活跃任务的副本"""
+        tasks = [task for _, task in list(self._active.values()) if task.status in statuses]
+        tasks.sort(key=lambda task: (-task.priority, task.created_at))
+        return tasks
+    
     async def table_exists(self) -> bool:
         """检查任务表是否存在"""
         try:
@@ -29,6 +90,7 @@ class TaskDAO(BaseDAO):
 
     async def create_task_table(self):
         """创建任务表"""
+        # 建表和索引放在同一个脚本中，一次提交给数据库线程执行
         create_sql = """
         CREATE TABLE IF NOT EXISTS tasks (
             task_id TEXT PRIMARY KEY,
@@ -39,38 +101,27 @@ class TaskDAO(BaseDAO):
             progress_data TEXT DEFAULT '{}',
             result_data TEXT DEFAULT NULL,
             parameters TEXT NOT NULL DEFAULT '{}',
-            created_at TEXT NOT NULL,
-            started_at TEXT DEFAULT NULL,
-            completed_at TEXT DEFAULT NULL,
-            updated_at TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            started_at INTEGER DEFAULT NULL,
+            completed_at INTEGER DEFAULT NULL,
+            updated_at INTEGER NOT NULL,
             priority INTEGER DEFAULT 0,
             max_retries INTEGER DEFAULT 3,
             retry_count INTEGER DEFAULT 0,
             timeout INTEGER DEFAULT NULL
-        )
-        """
-        await self.execute_query(create_sql)
+        );
         
-        # 创建索引
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)",
-            "CREATE INDEX IF NOT EXISTS idx_tasks_type ON tasks(task_type)",
-            "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)",
-            "CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority DESC)",
-        ]
-        
-        for index_sql in indexes:
-            await self.execute_query(index_sql)
+        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+        CREATE INDEX IF NOT EXISTS idx_tasks_type ON tasks(task_type);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+        CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority DESC);
+        """
+        await self.execute_script(create_sql)
         
         logger.info("任务表创建完成")
     
     async def save_task(self, task: BaseTask) -> bool:
-        """保存任务"""
-        # 检查表是否存在
-        if not await self.table_exists():
-            logger.error("任务表不存在，请先运行 'python -m src.cli init-db' 初始化数据库")
-            return False
-        
+        """保存任务，已存在时更新（创建时间保持不变）"""
         try:
             # 准备数据
             progress_json = json.dumps({
@@ -93,70 +144,51 @@ class TaskDAO(BaseDAO):
                 }, ensure_ascii=False)
             
             parameters_json = json.dumps(task.parameters, ensure_ascii=False)
+            updated_at = _now_ms()
             
-            # 检查任务是否已存在
-            existing = await self.get_task_by_id(task.task_id)
-            
-            if existing:
-                # 更新现有任务
-                update_sql = """
-                UPDATE tasks SET
-                    task_type = ?, title = ?, description = ?, status = ?,
-                    progress_data = ?, result_data = ?, parameters = ?,
-                    started_at = ?, completed_at = ?, updated_at = ?,
-                    priority = ?, max_retries = ?, retry_count = ?, timeout = ?
-                WHERE task_id = ?
-                """
-                await self.execute_update(update_sql, (
-                    task.task_type.value,
-                    task.title,
-                    task.description,
-                    task.status.value,
-                    progress_json,
-                    result_json,
-                    parameters_json,
-                    task.started_at.isoformat() if task.started_at else None,
-                    task.completed_at.isoformat() if task.completed_at else None,
-                    datetime.now().isoformat(),
-                    task.priority,
-                    task.max_retries,
-                    task.retry_count,
-                    task.timeout,
-                    task.task_id
-                ))
-            else:
-                # 插入新任务
-                insert_sql = """
-                INSERT INTO tasks (
-                    task_id, task_type, title, description, status,
-                    progress_data, result_data, parameters,
-                    created_at, started_at, completed_at, updated_at,
-                    priority, max_retries, retry_count, timeout
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-
-                await self.execute_insert(insert_sql, (
-                    task.task_id,
-                    task.task_type.value,
-                    task.title,
-                    task.description,
-                    task.status.value,
-                    progress_json,
-                    result_json,
-                    parameters_json,
-                    task.created_at.isoformat(),
-                    task.started_at.isoformat() if task.started_at else None,
-                    task.completed_at.isoformat() if task.completed_at else None,
-                    datetime.now().isoformat(),
-                    task.priority,
-                    task.max_retries,
-                    task.retry_count,
-                    task.timeout
-                ))
+            # 插入和更新合并为一条 upsert，不再先查询任务是否存在
+            upsert_sql = """
+            INSERT INTO tasks (
+                task_id, task_type, title, description, status,
+                progress_data, result_data, parameters,
+                created_at, started_at, completed_at, updated_at,
+                priority, max_retries, retry_count, timeout
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (task_id) DO UPDATE SET
+                task_type = excluded.task_type, title = excluded.title,
+                description = excluded.description, status = excluded.status,
+                progress_data = excluded.progress_data, result_data = excluded.result_data,
+                parameters = excluded.parameters, started_at = excluded.started_at,
+                completed_at = excluded.completed_at, updated_at = excluded.updated_at,
+                priority = excluded.priority, max_retries = excluded.max_retries,
+                retry_count = excluded.retry_count, timeout = excluded.timeout
+            """
+            await self.execute_update(upsert_sql, (
+                task.task_id,
+                task.task_type.value,
+                task.title,
+                task.description,
+                task.status.value,
+                progress_json,
+                result_json,
+                parameters_json,
+                _to_millis(task.created_at),
+                _to_millis(task.started_at),
+                _to_millis(task.completed_at),
+                updated_at,
+                task.priority,
+                task.max_retries,
+                task.retry_count,
+                task.timeout
+            ))
             
+            # 写入成功后才更新内存，失败时内存仍与数据库一致
+            self._update_cache(task, updated_at)
             return True
             
         except Exception as e:
+            if "no such table" in str(e):
+                logger.error("任务表不存在，请先运行 'python -m src.cli init-db' 初始化数据库")
             logger.error(f"保存任务失败: {e}")
             return False
     
@@ -178,6 +210,11 @@ class TaskDAO(BaseDAO):
     async def get_tasks_by_status(self, status: TaskStatus, limit: int = 100) -> List[BaseTask]:
         """根据状态获取任务列表"""
         try:
+            # 活跃状态读内存
+            if status in ACTIVE_STATUSES:
+                await self._ensure_cache_fresh()
+                return [copy.deepcopy(task) for task in self._cached_active_tasks((status,))[:limit]]
+            
             query = """
             SELECT * FROM tasks 
             WHERE status = ? 
@@ -212,14 +249,8 @@ class TaskDAO(BaseDAO):
     async def get_active_tasks(self) -> List[BaseTask]:
         """获取活跃任务（运行中或等待中）"""
         try:
-            query = """
-            SELECT * FROM tasks 
-            WHERE status IN ('pending', 'running', 'paused')
-            ORDER BY priority DESC, created_at ASC
-            """
-            rows = await self.execute_query(query)
-            
-            return [self._row_to_task(row) for row in rows]
+            await self._ensure_cache_fresh()
+            return [copy.deepcopy(task) for task in self._cached_active_tasks()]
             
         except Exception as e:
             logger.error(f"获取活跃任务失败: {e}")
@@ -245,28 +276,38 @@ class TaskDAO(BaseDAO):
         """删除任务"""
         try:
             query = "DELETE FROM tasks WHERE task_id = ?"
-            await self.execute_query(query, (task_id,))
+            await self.execute_delete(query, (task_id,))
+            self._active.pop(task_id, None)
             return True
             
         except Exception as e:
             logger.error(f"删除任务失败: {e}")
             return False
     
-    async def cleanup_old_tasks(self, days: int = 30) -> int:
-        """清理旧任务"""
+    async def cleanup_old_tasks(self, days: int = 30, chunk_size: int = 1000) -> int:
+        """清理旧任务，分批删除以缩短每次持有写锁的时间"""
         try:
-            from datetime import datetime, timedelta
-            
-            cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+            cutoff_date = _now_ms() - days * 86_400_000
             
             query = """
             DELETE FROM tasks 
-            WHERE status IN ('completed', 'failed', 'cancelled') 
-            AND completed_at < ?
+            WHERE task_id IN (
+                SELECT task_id FROM tasks
+                WHERE status IN ('completed', 'failed', 'cancelled') 
+                AND completed_at < ?
+                LIMIT ?
+            )
+            RETURNING task_id
             """
             
-            cursor = await self.execute_query(query, (cutoff_date,))
-            deleted_count = cursor.rowcount if hasattr(cursor, 'rowcount') else 0
+            deleted_count = 0
+            while True:
+                # 每批单独提交，批次之间让出写锁
+                async with self.transaction() as db:
+                    deleted = await db.execute_fetchall(query, (cutoff_date, chunk_size))
+                if not deleted:
+                    break
+                deleted_count += len(deleted)
             
             logger.info(f"清理了 {deleted_count} 个旧任务")
             return deleted_count
@@ -297,13 +338,15 @@ class TaskDAO(BaseDAO):
             type_stats = {row[0]: row[1] for row in type_rows}
             
             # 今日任务统计
-            today = datetime.now().date().isoformat()
+            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             today_query = """
             SELECT COUNT(*) 
             FROM tasks 
-            WHERE DATE(created_at) = ?
+            WHERE created_at >= ? AND created_at < ?
             """
-            today_rows = await self.execute_query(today_query, (today,))
+            today_rows = await self.execute_query(today_query, (
+                _to_millis(today_start), _to_millis(today_start + timedelta(days=1))
+            ))
             today_count = today_rows[0][0] if today_rows else 0
             
             return {
@@ -320,35 +363,19 @@ class TaskDAO(BaseDAO):
     def _row_to_task(self, row) -> BaseTask:
         """将数据库行转换为任务对象"""
         # 解析进度数据
-        progress_data = json.loads(row[5]) if row[5] else {}
+        progress_data = row["progress_data"]
+        progress = TaskProgress(**json.loads(progress_data)) if progress_data else TaskProgress()
         
         # 解析结果数据
-        result_data = json.loads(row[6]) if row[6] else None
+        result_data = row["result_data"]
+        result = TaskResult(**json.loads(result_data)) if result_data else None
         
         # 解析参数数据
-        parameters = json.loads(row[7]) if row[7] else {}
-        
-        # 创建任务对象
-        task_dict = {
-            "task_id": row[0],
-            "task_type": row[1],
-            "title": row[2],
-            "description": row[3],
-            "status": row[4],
-            "progress": progress_data,
-            "result": result_data,
-            "parameters": parameters,
-            "created_at": row[8],
-            "started_at": row[9],
-            "completed_at": row[10],
-            "updated_at": row[11],
-            "priority": row[12],
-            "max_retries": row[13],
-            "retry_count": row[14],
-            "timeout": row[15]
-        }
+        parameters_data = row["parameters"]
+        # 每行各自解析，参数中嵌套的列表和字典不会在任务对象之间共享
+        parameters = json.loads(parameters_data) if parameters_data else {}
         
-        return BaseTask.from_dict(task_dict)
+        return BaseTask._from_row_fast(row, progress, result, parameters)
 
 
 # 创建全局实例
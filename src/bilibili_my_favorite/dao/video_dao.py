@@ -3,27 +3,68 @@
 提供视频相关的数据库操作
 """
 import json
+import re
 import traceback
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, ClassVar
 from .base import BaseDAO
+from ..models.database import to_epoch_seconds, to_timestamp_text
+from ..utils.cache import TTLCache
 from ..utils.logger import logger
 
 
+# 完整的BV号，可以直接按 bvid 精确查找
+_BVID_PATTERN = re.compile(r"BV[0-9A-Za-z]{10}")
+
+
+def _build_fts_query(search: str) -> Optional[str]:
+    """将搜索词转换为 FTS5 MATCH 表达式，无法使用全文检索时返回 None"""
+    terms = search.split()
+    # trigram 分词器至少需要3个字符才能命中索引，更短的词仍走 LIKE
+    if not terms or any(len(term) < 3 for term in terms):
+        return None
+    # 每个词作为子串短语匹配，转义双引号避免注入 FTS 语法
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
 class VideoDAO(BaseDAO):
     """视频数据访问对象"""
     
-    async def get_videos_by_collection(self, collection_id: int, 
-                                     status: str = "all", 
-                                     search: str = None,
-                                     limit: int = None, 
-                                     offset: int = 0) -> List[Dict[str, Any]]:
-        """根据收藏夹获取视频列表"""
+    # update_video 允许更新的字段（顺序决定生成SQL中的列顺序）
+    UPDATABLE_FIELDS: ClassVar[Tuple[str, ...]] = (
+        "title", "cover_url", "local_cover_path", "page_count",
+        "duration", "attr", "ctime", "pubtime", "first_cid", "season_info",
+        "ogv_info", "link", "media_list_link", "is_deleted", "deleted_at"
+    )
+    
+    # 按字段组合缓存的UPDATE语句
+    _UPDATE_CACHE: ClassVar[Dict[Tuple[str, ...], str]] = {}
+    
+    # 只在同步时变化的读结果缓存，写入视频或收藏关系时通过版本号失效
+    _type_stats_cache: ClassVar[TTLCache] = TTLCache(maxsize=128, ttl=30)
+    _cache_version: ClassVar[int] = 0
+    
+    @classmethod
+    def invalidate_cache(cls):
+        """数据发生变化时使读缓存失效"""
+        cls._cache_version += 1
+        cls._type_stats_cache.clear()
+    
+    # 收藏夹视频列表的查询列
+    _COLLECTION_COLUMNS: ClassVar[str] = """
+        v.id, v.bilibili_id, v.bvid, v.title, v.cover_url, v.local_cover_path,
+        v.intro, v.duration, v.attr, v.ctime, v.pubtime, v.is_deleted, v.deleted_at,
+        u.name as uploader_name, u.mid as uploader_mid, u.face_url as uploader_face,
+        cv.fav_time, cv.first_seen, cv.last_seen
+        """
+    
+    # 排序与 idx_cv_collection_favtime 的正向扫描一致，视频ID保证顺序稳定
+    _COLLECTION_ORDER: ClassVar[str] = " ORDER BY cv.fav_time DESC, cv.video_id"
+    
+    def _collection_filter(self, collection_id: int, status: str,
+                           search: Optional[str]) -> Tuple[str, List[Any]]:
+        """生成收藏夹视频列表的 FROM/WHERE 子句和参数"""
         base_query = """
-        SELECT v.id, v.bilibili_id, v.bvid, v.title, v.cover_url, v.local_cover_path,
-               v.intro, v.duration, v.attr, v.ctime, v.pubtime, v.is_deleted, v.deleted_at,
-               u.name as uploader_name, u.mid as uploader_mid, u.face_url as uploader_face,
-               cv.fav_time, cv.first_seen, cv.last_seen
         FROM videos v
         JOIN collection_videos cv ON v.id = cv.video_id
         JOIN uploaders u ON v.uploader_mid = u.mid
@@ -39,24 +80,118 @@ class VideoDAO(BaseDAO):
         
         # 添加搜索过滤
         if search:
-            base_query += " AND (v.title LIKE ? OR u.name LIKE ?)"
-            search_param = f"%{search}%"
-            params.extend([search_param, search_param])
+            search = search.strip()
+            if _BVID_PATTERN.fullmatch(search):
+                # 输入的是BV号时走 bvid 索引等值查询
+                base_query += " AND v.bvid = ?"
+                params.append(search)
+            elif match_query := _build_fts_query(search):
+                base_query += " AND v.id IN (SELECT rowid FROM videos_fts WHERE videos_fts MATCH ?)"
+                params.append(match_query)
+            else:
+                base_query += " AND (v.title LIKE ? OR u.name LIKE ?)"
+                search_param = f"%{search}%"
+                params.extend([search_param, search_param])
         
-        # 添加排序
-        base_query += " ORDER BY cv.fav_time DESC"
+        return base_query, params
+    
+    async def get_videos_by_collection(self, collection_id: int, 
+                                     status: str = "all", 
+                                     search: str = None,
+                                     limit: int = None, 
+                                     offset: int = 0,
+                                     after_fav_time: Optional[int] = None,
+                                     after_video_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """根据收藏夹获取视频列表
         
-        # 添加分页
-        if limit:
-            base_query += " LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
+        传入上一页最后一条的 fav_time 和视频ID时按游标翻页（忽略 offset），
+        排序为 fav_time 降序、视频ID升序，fav_time 为空的记录排在最后
+        """
+        from_clause, params = self._collection_filter(collection_id, status, search)
+        base_query = "SELECT " + self._COLLECTION_COLUMNS + from_clause
+        order_clause = self._COLLECTION_ORDER
         
-        rows = await self.execute_query(base_query, tuple(params))
+        if after_video_id is None:
+            query = base_query + order_clause
+            query_params = list(params)
+            # 添加分页
+            if limit:
+                query += " LIMIT ? OFFSET ?"
+                query_params.extend([limit, offset])
+            rows = await self.execute_query(query, tuple(query_params))
+            return self.rows_to_dicts(rows)
+        
+        # 游标翻页：从上一页最后一条之后直接定位到索引位置，不再扫描并丢弃前面的行
+        rows = []
+        if after_fav_time is not None:
+            # fav_time <= ? 作为范围条件让索引可以直接定位
+            query = base_query + " AND cv.fav_time <= ? AND (cv.fav_time < ? OR cv.video_id > ?)" + order_clause
+            query_params = [*params, after_fav_time, after_fav_time, after_video_id]
+            if limit:
+                query += " LIMIT ?"
+                query_params.append(limit)
+            rows = list(await self.execute_query(query, tuple(query_params)))
+            if limit and len(rows) >= limit:
+                return self.rows_to_dicts(rows)
+            # 有时间的记录已取完，接着取 fav_time 为空的记录
+            null_query = base_query + " AND cv.fav_time IS NULL" + order_clause
+            null_params = list(params)
+        else:
+            null_query = base_query + " AND cv.fav_time IS NULL AND cv.video_id > ?" + order_clause
+            null_params = [*params, after_video_id]
+        
+        if limit:
+            null_query += " LIMIT ?"
+            null_params.append(limit - len(rows))
+        rows.extend(await self.execute_query(null_query, tuple(null_params)))
         return self.rows_to_dicts(rows)
     
-    async def get_video_by_id(self, video_id: int) -> Optional[Dict[str, Any]]:
-        """根据ID获取视频详情"""
-        query = """
+    async def get_collection_page(self, collection_id: int,
+                                  status: str = "all",
+                                  search: str = None,
+                                  limit: int = 20,
+                                  offset: int = 0,
+                                  after_fav_time: Optional[int] = None,
+                                  after_video_id: Optional[int] = None) -> Dict[str, Any]:
+        """获取收藏夹的一页视频及筛选结果的总数
+        
+        普通分页时用窗口函数在同一条查询里得到总数，返回 {"items", "total"}
+        """
+        from_clause, params = self._collection_filter(collection_id, status, search)
+        total = None
+        
+        if after_video_id is None:
+            query = f"""
+            SELECT {self._COLLECTION_COLUMNS}, COUNT(*) OVER () as total_count
+            {from_clause}{self._COLLECTION_ORDER}
+            LIMIT ? OFFSET ?
+            """
+            items = self.rows_to_dicts(await self.execute_query(query, (*params, limit, offset)))
+            for item in items:
+                total = item.pop("total_count")
+        else:
+            items = await self.get_videos_by_collection(
+                collection_id, status, search, limit=limit,
+                after_fav_time=after_fav_time, after_video_id=after_video_id
+            )
+        
+        if total is None:
+            # 游标翻页或页码超出范围时，窗口计数拿不到，单独计数一次
+            row = await self.execute_one(f"SELECT COUNT(*) {from_clause}", tuple(params))
+            total = row[0]
+        
+        return {"items": items, "total": total}
+    
+    @staticmethod
+    def next_cursor(videos: List[Dict[str, Any]], page_size: int) -> Optional[Dict[str, Any]]:
+        """根据 get_collection_page 返回的本页最后一个视频生成下一页游标，已到末页时返回 None"""
+        if len(videos) < page_size:
+            return None
+        last = videos[-1]
+        return {"after_fav_time": last["fav_time"], "after_video_id": last["id"]}
+    
+    # 视频详情查询的公共部分，按ID/BVID查询时追加 WHERE 条件
+    _DETAIL_SELECT: ClassVar[str] = """
         SELECT v.id, v.bilibili_id, v.bvid, v.type, v.title, v.cover_url, v.local_cover_path,
                v.intro, v.page_count, v.duration, v.attr, v.ctime, v.pubtime,
                v.first_cid, v.season_info, v.ogv_info, v.link, v.media_list_link,
@@ -65,27 +200,33 @@ class VideoDAO(BaseDAO):
                u.jump_link as uploader_jump_link
         FROM videos v
         JOIN uploaders u ON v.uploader_mid = u.mid
-        WHERE v.id = ?
         """
-        row = await self.execute_one(query, (video_id,))
+    
+    # 批量查询时每条 IN 语句的参数个数上限
+    _BATCH_SIZE: ClassVar[int] = 500
+    
+    async def get_video_by_id(self, video_id: int) -> Optional[Dict[str, Any]]:
+        """根据ID获取视频详情"""
+        row = await self.execute_one(self._DETAIL_SELECT + " WHERE v.id = ?", (video_id,))
         return self.row_to_dict(row)
     
     async def get_video_by_bvid(self, bvid: str) -> Optional[Dict[str, Any]]:
         """根据BVID获取视频（返回单个视频记录，不包含收藏夹信息）"""
-        query = """
-        SELECT v.id, v.bilibili_id, v.bvid, v.type, v.title, v.cover_url, v.local_cover_path,
-               v.intro, v.page_count, v.duration, v.attr, v.ctime, v.pubtime,
-               v.first_cid, v.season_info, v.ogv_info, v.link, v.media_list_link,
-               v.is_deleted, v.deleted_at, v.created_at, v.updated_at,
-               u.name as uploader_name, u.mid as uploader_mid, u.face_url as uploader_face,
-               u.jump_link as uploader_jump_link
-        FROM videos v
-        JOIN uploaders u ON v.uploader_mid = u.mid
-        WHERE v.bvid = ?
-        """
-        row = await self.execute_one(query, (bvid,))
+        row = await self.execute_one(self._DETAIL_SELECT + " WHERE v.bvid = ?", (bvid,))
         return self.row_to_dict(row)
     
+    async def get_videos_by_bvids(self, bvids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """根据BVID批量获取视频详情，不存在的BVID不会出现在结果中"""
+        bvids = list(dict.fromkeys(bvids))
+        videos: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(bvids), self._BATCH_SIZE):
+            chunk = bvids[start:start + self._BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = await self.execute_query(f"{self._DETAIL_SELECT} WHERE v.bvid IN ({placeholders})", tuple(chunk))
+            for video in self.rows_to_dicts(rows):
+                videos[video["bvid"]] = video
+        return videos
+    
     async def get_video_collections(self, bvid: str) -> List[Dict[str, Any]]:
         """根据BVID获取视频所在的所有收藏夹"""
         query = """
@@ -101,10 +242,8 @@ class VideoDAO(BaseDAO):
         rows = await self.execute_query(query, (bvid,))
         return self.rows_to_dicts(rows)
     
-    async def create_video(self, video_data: Dict[str, Any]) -> int:
-        """创建新视频记录"""
-        now = datetime.now(timezone.utc)
-        query = """
+    # 新建视频的插入语句和参数，create_video 与 bulk_save_videos 共用
+    _INSERT_VIDEO_SQL: ClassVar[str] = """
         INSERT INTO videos (
             bilibili_id, bvid, type, title, cover_url, local_cover_path, intro, 
             page_count, duration, uploader_mid, attr, ctime, pubtime, 
@@ -112,7 +251,10 @@ class VideoDAO(BaseDAO):
             is_deleted, deleted_at, created_at, updated_at
         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
-        params = (
+    
+    @staticmethod
+    def _insert_video_params(video_data: Dict[str, Any], now: int) -> tuple:
+        return (
             video_data.get("bilibili_id"), video_data.get("bvid"), 
             video_data.get("type", 2), video_data.get("title"),
             video_data.get("cover_url"), video_data.get("local_cover_path"),
@@ -123,101 +265,220 @@ class VideoDAO(BaseDAO):
             video_data.get("ogv_info"), video_data.get("link"), 
             video_data.get("media_list_link"),
             video_data.get("is_deleted", False),
-            video_data.get("deleted_at"),
+            to_epoch_seconds(video_data.get("deleted_at")),
             now, now
         )
-        return await self.execute_insert(query, params)
+    
+    def _update_video_sql(self, fields: Tuple[str, ...]) -> str:
+        """按字段组合生成UPDATE语句，相同字段组合复用已生成的SQL"""
+        query = self._UPDATE_CACHE.get(fields)
+        if query is None:
+            set_clause = ", ".join(f"{field} = ?" for field in fields)
+            query = f"UPDATE videos SET {set_clause}, updated_at = ? WHERE id = ?"
+            self._UPDATE_CACHE[fields] = query
+        return query
+    
+    async def create_video(self, video_data: Dict[str, Any]) -> int:
+        """创建新视频记录"""
+        now = to_epoch_seconds(datetime.now(timezone.utc))
+        video_id = await self.execute_insert(self._INSERT_VIDEO_SQL, self._insert_video_params(video_data, now))
+        self.invalidate_cache()
+        return video_id
     
     async def update_video(self, video_id: int, video_data: Dict[str, Any]) -> int:
         """更新视频信息"""
-        now = datetime.now(timezone.utc)
-        
-        # 构建动态更新查询
-        update_fields = []
-        params = []
-        
-        updatable_fields = [
-            "title", "cover_url", "local_cover_path", "page_count", 
-            "duration", "attr", "ctime", "pubtime", "first_cid", "season_info", 
-            "ogv_info", "link", "media_list_link", "is_deleted", "deleted_at"
-        ]
-        
-        for field in updatable_fields:
-            if field in video_data:
-                update_fields.append(f"{field} = ?")
-                params.append(video_data[field])
-        
-        if not update_fields:
+        fields = tuple(field for field in self.UPDATABLE_FIELDS if field in video_data)
+        if not fields:
             return 0
         
-        update_fields.append("updated_at = ?")
-        params.append(now)
+        query = self._update_video_sql(fields)
+        
+        # 时间字段统一存为秒级时间戳
+        params = [to_epoch_seconds(video_data[field]) for field in fields]
+        params.append(to_epoch_seconds(datetime.now(timezone.utc)))
         params.append(video_id)
+        rowcount = await self.execute_update(query, tuple(params))
+        self.invalidate_cache()
+        return rowcount
+    
+    async def bulk_save_videos(self, new_videos: List[Dict[str, Any]],
+                               updated_videos: List[Tuple[int, Dict[str, Any]]],
+                               now: Optional[datetime] = None) -> Dict[str, int]:
+        """在单个事务中批量新建和更新视频，updated_videos 为 (video_id, video_data) 列表
         
-        query = f"UPDATE videos SET {', '.join(update_fields)} WHERE id = ?"
-        return await self.execute_update(query, tuple(params))
+        Returns:
+            新建视频的 {bvid: id}
+        """
+        if not new_videos and not updated_videos:
+            return {}
+        
+        # 更新按字段组合分组，每组一次 executemany
+        update_groups: Dict[Tuple[str, ...], List[tuple]] = {}
+        async with self.transaction() as tx:
+            now = to_epoch_seconds(now or tx.now)
+            for video_id, video_data in updated_videos:
+                fields = tuple(field for field in self.UPDATABLE_FIELDS if field in video_data)
+                if fields:
+                    params = [to_epoch_seconds(video_data[field]) for field in fields]
+                    params.append(now)
+                    params.append(video_id)
+                    update_groups.setdefault(fields, []).append(tuple(params))
+            for fields, params_list in update_groups.items():
+                await tx.executemany(self._update_video_sql(fields), params_list)
+            
+            created: Dict[str, int] = {}
+            if new_videos:
+                await tx.executemany(
+                    self._INSERT_VIDEO_SQL,
+                    [self._insert_video_params(video_data, now) for video_data in new_videos]
+                )
+                # executemany 不返回每行ID，插入后按BVID回查
+                bvids = [video_data["bvid"] for video_data in new_videos]
+                for start in range(0, len(bvids), self._BATCH_SIZE):
+                    chunk = bvids[start:start + self._BATCH_SIZE]
+                    placeholders = ", ".join("?" * len(chunk))
+                    rows = await tx.execute_fetchall(
+                        f"SELECT bvid, id FROM videos WHERE bvid IN ({placeholders})", tuple(chunk)
+                    )
+                    created.update((row[0], row[1]) for row in rows)
+        self.invalidate_cache()
+        return created
+    
+    # 高频的单字段更新使用固定SQL，避免每次按字段组合拼接
+    _UPDATE_COVER_PATH_SQL: ClassVar[str] = "UPDATE videos SET local_cover_path = ?, updated_at = ? WHERE id = ?"
+    _MARK_DELETED_SQL: ClassVar[str] = "UPDATE videos SET is_deleted = 1, deleted_at = ?, updated_at = ? WHERE id = ?"
+    _MARK_AVAILABLE_SQL: ClassVar[str] = "UPDATE videos SET is_deleted = 0, deleted_at = NULL, updated_at = ? WHERE id = ?"
+    
+    async def bulk_update_local_cover_paths(self, items: List[Tuple[int, str]]) -> None:
+        """批量更新本地封面路径，items 为 (video_id, local_cover_path) 列表；同步的封面下载阶段完成后一次写入"""
+        if not items:
+            return
+        now = to_epoch_seconds(datetime.now(timezone.utc))
+        # 分批提交，避免长时间占用写锁，阻塞其他事件循环（任务执行器）的写入
+        for start in range(0, len(items), self._BATCH_SIZE):
+            await self.execute_batch(
+                self._UPDATE_COVER_PATH_SQL,
+                [(local_cover_path, now, video_id) for video_id, local_cover_path in items[start:start + self._BATCH_SIZE]]
+            )
+        self.invalidate_cache()
     
     async def mark_as_deleted(self, video_id: int, reason: str = None) -> int:
         """标记视频为已删除"""
-        now = datetime.now(timezone.utc)
-        query = """
-        UPDATE videos SET 
-            is_deleted = 1, deleted_at = ?, updated_at = ?
-        WHERE id = ?
+        now = to_epoch_seconds(datetime.now(timezone.utc))
+        rowcount = await self.execute_update(self._MARK_DELETED_SQL, (now, now, video_id))
+        self.invalidate_cache()
+        return rowcount
+
+    async def bulk_remove_deleted_from_collection(self, collection_id: int,
+                                                  videos: List[Dict[str, Any]],
+                                                  reason: str = None) -> None:
+        """批量将视频标记为已删除、移出收藏夹并记录删除日志
+
+        每批视频的三项写入在同一事务中完成，批次之间提交，避免长时间占用写锁。
+        videos 中每项需包含 id、bvid、title、uploader_name
         """
-        return await self.execute_update(query, (now, now, video_id))
-    
+        if not videos:
+            return
+        deleted_at = datetime.now(timezone.utc)
+        now = to_epoch_seconds(deleted_at)
+        for start in range(0, len(videos), self._BATCH_SIZE):
+            chunk = videos[start:start + self._BATCH_SIZE]
+            async with self.transaction() as tx:
+                await tx.executemany(self._MARK_DELETED_SQL, [(now, now, video["id"]) for video in chunk])
+                await tx.executemany(
+                    "DELETE FROM collection_videos WHERE collection_id = ? AND video_id = ?",
+                    [(collection_id, video["id"]) for video in chunk]
+                )
+                await tx.executemany("""
+                    INSERT INTO deletion_logs (
+                        collection_id, video_bvid, video_title, uploader_name, deleted_at, reason
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                """, [
+                    (collection_id, video["bvid"], video["title"],
+                     video.get("uploader_name") or "Unknown", to_timestamp_text(deleted_at), reason)
+                    for video in chunk
+                ])
+        self.invalidate_cache()
+
     async def mark_as_available(self, video_id: int) -> int:
         """标记视频为可用"""
-        now = datetime.now(timezone.utc)
-        query = """
-        UPDATE videos SET 
-            is_deleted = 0, deleted_at = NULL, updated_at = ?
-        WHERE id = ?
-        """
-        return await self.execute_update(query, (now, video_id))
+        rowcount = await self.execute_update(
+            self._MARK_AVAILABLE_SQL, (to_epoch_seconds(datetime.now(timezone.utc)), video_id)
+        )
+        self.invalidate_cache()
+        return rowcount
     
     async def add_to_collection(self, collection_id: int, video_id: int, 
                               fav_time: int = None) -> int:
-        """将视频添加到收藏夹"""
-        now = datetime.now(timezone.utc)
-        
-        # 检查是否已存在
-        existing = await self.execute_one(
-            "SELECT id FROM collection_videos WHERE collection_id = ? AND video_id = ?",
-            (collection_id, video_id)
+        """将视频添加到收藏夹，已存在时更新收藏时间和最后出现时间"""
+        now = to_epoch_seconds(datetime.now(timezone.utc))
+        query = """
+        INSERT INTO collection_videos (
+            collection_id, video_id, fav_time,
+            first_seen, last_seen, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (collection_id, video_id) DO UPDATE SET
+            fav_time = excluded.fav_time,
+            last_seen = excluded.last_seen,
+            updated_at = excluded.updated_at
+        RETURNING id
+        """
+        row = await self.execute_returning(
+            query, (collection_id, video_id, fav_time, now, now, now, now)
         )
-        
-        if existing:
-            # 更新现有记录
-            query = """
-            UPDATE collection_videos SET 
-                fav_time = ?, last_seen = ?, updated_at = ?
-            WHERE collection_id = ? AND video_id = ?
-            """
-            await self.execute_update(
-                query, (fav_time, now, now, collection_id, video_id)
-            )
-            return existing["id"]
-        else:
-            # 创建新记录
-            query = """
-            INSERT INTO collection_videos (
-                collection_id, video_id, fav_time,
-                first_seen, last_seen, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """
-            return await self.execute_insert(
-                query, (collection_id, video_id, fav_time, now, now, now, now)
-            )
+        self.invalidate_cache()
+        return row["id"]
     
+    async def bulk_upsert_collection_videos(self, collection_id: int,
+                                            items: List[Tuple[int, Optional[int]]],
+                                            now: Optional[datetime] = None) -> None:
+        """在单个事务中批量写入收藏关系，items 为 (video_id, fav_time) 列表
+        
+        now 为本次同步的统一时间，不传时使用事务时间
+        """
+        if not items:
+            return
+        query = """
+        INSERT INTO collection_videos (
+            collection_id, video_id, fav_time,
+            first_seen, last_seen, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (collection_id, video_id) DO UPDATE SET
+            fav_time = excluded.fav_time,
+            last_seen = excluded.last_seen,
+            updated_at = excluded.updated_at
+        """
+        async with self.transaction() as tx:
+            now = to_epoch_seconds(now or tx.now)
+            params_list = [
+                (collection_id, video_id, fav_time, now, now, now, now)
+                for video_id, fav_time in items
+            ]
+            await tx.executemany(query, params_list)
+        self.invalidate_cache()
+
+    async def touch_collection_videos(self, collection_id: int, video_ids: List[int],
+                                      now: Optional[datetime] = None) -> int:
+        """只刷新未变化的收藏关系的最后出现时间，一条语句完成，返回影响的行数"""
+        if not video_ids:
+            return 0
+        now = to_epoch_seconds(now or datetime.now(timezone.utc))
+        # ID 列表以 JSON 数组传入，不受 SQL 参数个数限制
+        query = """
+        UPDATE collection_videos SET last_seen = ?, updated_at = ?
+        WHERE collection_id = ? AND video_id IN (SELECT value FROM json_each(?))
+        """
+        return await self.execute_update(query, (now, now, collection_id, json.dumps(video_ids)))
+
     async def remove_from_collection(self, collection_id: int, video_id: int) -> int:
         """从收藏夹中移除视频"""
         query = """
         DELETE FROM collection_videos 
         WHERE collection_id = ? AND video_id = ?
         """
-        return await self.execute_delete(query, (collection_id, video_id))
+        rowcount = await self.execute_delete(query, (collection_id, video_id))
+        self.invalidate_cache()
+        return rowcount
     
     async def get_video_stats(self, video_id: int, latest_only: bool = True) -> List[Dict[str, Any]]:
         """获取视频统计信息"""
@@ -235,22 +496,45 @@ class VideoDAO(BaseDAO):
         rows = await self.execute_query(query, (video_id,))
         return self.rows_to_dicts(rows)
     
-    async def add_video_stats(self, video_id: int, stats_data: Dict[str, Any]) -> int:
-        """添加视频统计信息"""
-        now = datetime.now(timezone.utc)
-        query = """
-        INSERT INTO video_stats (
-            video_id, collect_count, play_count, danmaku_count, reply_count,
-            view_text, vt, play_switch, recorded_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        params = (
+    # 视频统计写入语句
+    _INSERT_STATS_SQL: ClassVar[str] = """
+    INSERT INTO video_stats (
+        video_id, collect_count, play_count, danmaku_count, reply_count,
+        view_text, vt, play_switch, recorded_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    @staticmethod
+    def _stats_params(video_id: int, stats_data: Dict[str, Any], now: datetime) -> tuple:
+        """构建统计信息写入参数"""
+        return (
             video_id, stats_data.get("collect", 0), stats_data.get("play", 0),
             stats_data.get("danmaku", 0), stats_data.get("reply", 0),
             stats_data.get("view_text_1", ""), stats_data.get("vt", 0),
-            stats_data.get("play_switch", 0), now
+            stats_data.get("play_switch", 0), to_timestamp_text(now)
         )
-        return await self.execute_insert(query, params)
+    
+    async def add_video_stats(self, video_id: int, stats_data: Dict[str, Any]) -> int:
+        """添加视频统计信息"""
+        now = datetime.now(timezone.utc)
+        return await self.execute_insert(
+            self._INSERT_STATS_SQL, self._stats_params(video_id, stats_data, now)
+        )
+    
+    async def bulk_insert_video_stats(self, items: List[Tuple[int, Dict[str, Any]]],
+                                      now: Optional[datetime] = None) -> None:
+        """在单个事务中批量添加统计信息，items 为 (video_id, stats_data) 列表
+        
+        每次同步都为每个视频写入一条快照，即使与上一条相同，按同步次数统计或绘图时不会出现缺口
+        """
+        if not items:
+            return
+        async with self.transaction() as tx:
+            now = now or tx.now
+            await tx.executemany(
+                self._INSERT_STATS_SQL,
+                [self._stats_params(video_id, stats_data, now) for video_id, stats_data in items]
+            )
     
     async def get_official_videos(self, collection_id: int = None, 
                                 limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
@@ -279,8 +563,8 @@ class VideoDAO(BaseDAO):
             """
             params.append(collection_id)
         
-        # 添加排序
-        base_query += " ORDER BY v.created_at DESC"
+        # 添加排序，与 idx_videos_has_ogv 一致，视频ID保证顺序稳定
+        base_query += " ORDER BY v.created_at DESC, v.id DESC"
         
         # 添加分页
         if limit:
@@ -292,30 +576,42 @@ class VideoDAO(BaseDAO):
     
     async def get_video_type_stats(self, collection_id: int = None) -> Dict[str, int]:
         """获取视频类型统计（普通视频 vs 官方影视作品）"""
-        base_query = """
-        SELECT 
-            COUNT(CASE WHEN v.ogv_info IS NULL OR v.ogv_info = '' THEN 1 END) as normal_videos,
-            COUNT(CASE WHEN v.ogv_info IS NOT NULL AND v.ogv_info != '' THEN 1 END) as official_videos,
-            COUNT(*) as total_videos
-        FROM videos v
-        """
-        params = []
+        cached = self._type_stats_cache.get(collection_id)
+        if cached is not None:
+            return dict(cached)
         
+        version = self._cache_version
         if collection_id:
-            base_query += """
-            JOIN collection_videos cv ON v.id = cv.video_id
+            query = """
+            SELECT COUNT(*) as total_videos,
+                   COUNT(CASE WHEN v.ogv_info IS NOT NULL AND v.ogv_info != '' THEN 1 END) as official_videos
+            FROM collection_videos cv
+            JOIN videos v ON v.id = cv.video_id
             WHERE cv.collection_id = ?
             """
-            params.append(collection_id)
+            params = (collection_id,)
+        else:
+            # 官方影视作品数量直接在 idx_videos_has_ogv 部分索引上计数
+            query = """
+            SELECT (SELECT COUNT(*) FROM videos) as total_videos,
+                   (SELECT COUNT(*) FROM videos
+                    WHERE ogv_info IS NOT NULL AND ogv_info != '') as official_videos
+            """
+            params = ()
         
-        row = await self.execute_one(base_query, tuple(params))
-        result = self.row_to_dict(row)
+        row = await self.execute_one(query, params)
+        result = self.row_to_dict(row) or {}
+        total_videos = result.get("total_videos") or 0
+        official_videos = result.get("official_videos") or 0
         
-        return {
-            "normal_videos": result.get("normal_videos", 0),
-            "official_videos": result.get("official_videos", 0),
-            "total_videos": result.get("total_videos", 0)
+        stats = {
+            "normal_videos": total_videos - official_videos,
+            "official_videos": official_videos,
+            "total_videos": total_videos
         }
+        if version == self._cache_version:
+            self._type_stats_cache.set(collection_id, dict(stats))
+        return stats
 
 
 # 创建全局实例
@@ -8,355 +8,354 @@
 - videos.first_cid: 视频的第一个分P的CID，用于播放和下载
 - videos.attr: 视频属性标识，用于判断视频状态（如是否失效）
 - videos.type: 视频类型，2表示普通视频，其他值表示特殊类型内容
+- videos 与 collection_videos 的时间字段（created_at、updated_at、deleted_at、first_seen、last_seen）为 UTC 秒级时间戳
+- collections.last_full_sync: 上次完整同步（检测取消收藏的视频）的 UTC 秒级时间戳，由迁移 v8 添加
 """
-import aiosqlite
 import os
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import json
 from contextlib import asynccontextmanager
 
 from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.core.db_pool import get_pool, close_pool
+from bilibili_my_favorite.models.database_migration import check_migration_needed, migrate_database
+
+# 初始表结构，首次创建数据库时在一个事务中整体执行
+SCHEMA_SQL = """
+BEGIN;
+
+-- 用户表
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mid TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    face_url TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 收藏夹表
+CREATE TABLE IF NOT EXISTS collections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bilibili_fid TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    user_mid TEXT NOT NULL,
+    description TEXT,
+    cover_url TEXT,
+    media_count INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_synced TIMESTAMP,
+    FOREIGN KEY (user_mid) REFERENCES users (mid) ON DELETE CASCADE
+);
+
+-- UP主表
+CREATE TABLE IF NOT EXISTS uploaders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mid TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    face_url TEXT,
+    jump_link TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 视频表
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bilibili_id TEXT NOT NULL,
+    bvid TEXT NOT NULL,
+    type INTEGER NOT NULL DEFAULT 2,
+    title TEXT NOT NULL,
+    cover_url TEXT,
+    local_cover_path TEXT,
+    intro TEXT,
+    page_count INTEGER DEFAULT 1,
+    duration INTEGER DEFAULT 0,
+    uploader_mid TEXT NOT NULL,
+    attr INTEGER DEFAULT 0,
+    ctime INTEGER,
+    pubtime INTEGER,
+    first_cid TEXT,
+    season_info TEXT,
+    ogv_info TEXT,
+    link TEXT,
+    media_list_link TEXT,
+    is_deleted BOOLEAN DEFAULT FALSE,
+    deleted_at INTEGER,
+    created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    FOREIGN KEY (uploader_mid) REFERENCES uploaders (mid) ON DELETE CASCADE,
+    UNIQUE (bilibili_id, bvid)
+);
+
+-- 收藏记录表（多对多关系）
+CREATE TABLE IF NOT EXISTS collection_videos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection_id INTEGER NOT NULL,
+    video_id INTEGER NOT NULL,
+    fav_time INTEGER,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    FOREIGN KEY (collection_id) REFERENCES collections (id) ON DELETE CASCADE,
+    FOREIGN KEY (video_id) REFERENCES videos (id) ON DELETE CASCADE,
+    UNIQUE (collection_id, video_id)
+);
+
+-- 视频统计表
+CREATE TABLE IF NOT EXISTS video_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id INTEGER NOT NULL,
+    collect_count INTEGER DEFAULT 0,
+    play_count INTEGER DEFAULT 0,
+    danmaku_count INTEGER DEFAULT 0,
+    reply_count INTEGER DEFAULT 0,
+    view_text TEXT,
+    vt INTEGER DEFAULT 0,
+    play_switch INTEGER DEFAULT 0,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (video_id) REFERENCES videos (id) ON DELETE CASCADE
+);
+
+-- 删除记录表
+CREATE TABLE IF NOT EXISTS deletion_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection_id INTEGER NOT NULL,
+    video_bvid TEXT NOT NULL,
+    video_title TEXT NOT NULL,
+    uploader_name TEXT,
+    deleted_at TIMESTAMP NOT NULL,
+    reason TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (collection_id) REFERENCES collections (id) ON DELETE CASCADE
+);
+
+-- 索引
+CREATE INDEX IF NOT EXISTS idx_users_mid ON users (mid);
+CREATE INDEX IF NOT EXISTS idx_collections_fid ON collections (bilibili_fid);
+CREATE INDEX IF NOT EXISTS idx_collections_user ON collections (user_mid);
+CREATE INDEX IF NOT EXISTS idx_uploaders_mid ON uploaders (mid);
+CREATE INDEX IF NOT EXISTS idx_videos_bvid ON videos (bvid);
+CREATE INDEX IF NOT EXISTS idx_videos_bilibili_id ON videos (bilibili_id);
+CREATE INDEX IF NOT EXISTS idx_videos_uploader ON videos (uploader_mid);
+CREATE INDEX IF NOT EXISTS idx_videos_deleted ON videos (is_deleted);
+CREATE INDEX IF NOT EXISTS idx_videos_available ON videos (id) WHERE is_deleted = 0;
+CREATE INDEX IF NOT EXISTS idx_videos_has_ogv ON videos (created_at DESC, id DESC) WHERE ogv_info IS NOT NULL AND ogv_info != '';
+CREATE INDEX IF NOT EXISTS idx_collection_videos_collection ON collection_videos (collection_id);
+CREATE INDEX IF NOT EXISTS idx_collection_videos_video ON collection_videos (video_id);
+CREATE INDEX IF NOT EXISTS idx_cv_collection_favtime ON collection_videos (collection_id, fav_time DESC, video_id);
+CREATE INDEX IF NOT EXISTS idx_video_stats_video ON video_stats (video_id);
+CREATE INDEX IF NOT EXISTS idx_deletion_logs_collection ON deletion_logs (collection_id);
+CREATE INDEX IF NOT EXISTS idx_deletion_logs_bvid ON deletion_logs (video_bvid);
+
+COMMIT;
+"""
+
+
+def to_epoch_seconds(value: Any) -> Any:
+    """将 datetime 转换为秒级时间戳，其他值原样返回"""
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return value
+
+
+def to_timestamp_text(value: Any) -> Any:
+    """将 datetime 转换为 TIMESTAMP 列的文本（与 sqlite3 已弃用的默认适配器格式相同），其他值原样返回"""
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return value
+
 
 @asynccontextmanager
 async def get_db_connection():
-    """建立异步SQLite数据库连接"""
-    db = await aiosqlite.connect(config.DATABASE_PATH)
-    db.row_factory = aiosqlite.Row
-    try:
-        yield db
-    finally:
-        await db.close()
+    """从连接池借出写连接（以下辅助函数均会写入数据库），出错时回滚未提交的事务"""
+    pool = await get_pool()
+    async with pool.acquire_writer() as db:
+        try:
+            yield db
+        except Exception:
+            # 写连接在连接池中复用，不回滚的话后续事务都会因"事务中不能再开启事务"而失败
+            await db.rollback()
+            raise
 
 
 async def initialize_database():
     """初始化数据库并创建表结构"""
     if config.DATABASE_PATH.exists():
         print(f"数据库文件已存在: {config.DATABASE_PATH}")
+        if await check_migration_needed():
+            await migrate_database()
         return
     async with get_db_connection() as db:
-        # 用户表
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            mid TEXT UNIQUE NOT NULL,
-            name TEXT NOT NULL,
-            face_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-
-        # 收藏夹表
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS collections (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bilibili_fid TEXT UNIQUE NOT NULL,
-            title TEXT NOT NULL,
-            user_mid TEXT NOT NULL,
-            description TEXT,
-            cover_url TEXT,
-            media_count INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_synced TIMESTAMP,
-            FOREIGN KEY (user_mid) REFERENCES users (mid) ON DELETE CASCADE
-        );
-        """)
-
-        # UP主表
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS uploaders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            mid TEXT UNIQUE NOT NULL,
-            name TEXT NOT NULL,
-            face_url TEXT,
-            jump_link TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-
-        # 视频表
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS videos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bilibili_id TEXT NOT NULL,
-            bvid TEXT NOT NULL,
-            type INTEGER NOT NULL DEFAULT 2,
-            title TEXT NOT NULL,
-            cover_url TEXT,
-            local_cover_path TEXT,
-            intro TEXT,
-            page_count INTEGER DEFAULT 1,
-            duration INTEGER DEFAULT 0,
-            uploader_mid TEXT NOT NULL,
-            attr INTEGER DEFAULT 0,
-            ctime INTEGER,
-            pubtime INTEGER,
-            first_cid TEXT,
-            season_info TEXT,
-            ogv_info TEXT,
-            link TEXT,
-            media_list_link TEXT,
-            is_deleted BOOLEAN DEFAULT FALSE,
-            deleted_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (uploader_mid) REFERENCES uploaders (mid) ON DELETE CASCADE,
-            UNIQUE (bilibili_id, bvid)
-        );
-        """)
-
-        # 收藏记录表（多对多关系）
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS collection_videos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            collection_id INTEGER NOT NULL,
-            video_id INTEGER NOT NULL,
-            fav_time INTEGER,
-            first_seen TIMESTAMP NOT NULL,
-            last_seen TIMESTAMP NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (collection_id) REFERENCES collections (id) ON DELETE CASCADE,
-            FOREIGN KEY (video_id) REFERENCES videos (id) ON DELETE CASCADE,
-            UNIQUE (collection_id, video_id)
-        );
-        """)
-
-        # 视频统计表
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS video_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_id INTEGER NOT NULL,
-            collect_count INTEGER DEFAULT 0,
-            play_count INTEGER DEFAULT 0,
-            danmaku_count INTEGER DEFAULT 0,
-            reply_count INTEGER DEFAULT 0,
-            view_text TEXT,
-            vt INTEGER DEFAULT 0,
-            play_switch INTEGER DEFAULT 0,
-            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (video_id) REFERENCES videos (id) ON DELETE CASCADE
-        );
-        """)
-
-        # 删除记录表
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS deletion_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            collection_id INTEGER NOT NULL,
-            video_bvid TEXT NOT NULL,
-            video_title TEXT NOT NULL,
-            uploader_name TEXT,
-            deleted_at TIMESTAMP NOT NULL,
-            reason TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (collection_id) REFERENCES collections (id) ON DELETE CASCADE
-        );
-        """)
-
-        # 创建索引
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_users_mid ON users (mid);",
-            "CREATE INDEX IF NOT EXISTS idx_collections_fid ON collections (bilibili_fid);",
-            "CREATE INDEX IF NOT EXISTS idx_collections_user ON collections (user_mid);",
-            "CREATE INDEX IF NOT EXISTS idx_uploaders_mid ON uploaders (mid);",
-            "CREATE INDEX IF NOT EXISTS idx_videos_bvid ON videos (bvid);",
-            "CREATE INDEX IF NOT EXISTS idx_videos_bilibili_id ON videos (bilibili_id);",
-            "CREATE INDEX IF NOT EXISTS idx_videos_uploader ON videos (uploader_mid);",
-            "CREATE INDEX IF NOT EXISTS idx_videos_deleted ON videos (is_deleted);",
-            "CREATE INDEX IF NOT EXISTS idx_collection_videos_collection ON collection_videos (collection_id);",
-            "CREATE INDEX IF NOT EXISTS idx_collection_videos_video ON collection_videos (video_id);",
-            "CREATE INDEX IF NOT EXISTS idx_video_stats_video ON video_stats (video_id);",
-            "CREATE INDEX IF NOT EXISTS idx_deletion_logs_collection ON deletion_logs (collection_id);",
-            "CREATE INDEX IF NOT EXISTS idx_deletion_logs_bvid ON deletion_logs (video_bvid);"
-        ]
-        
-        for index_sql in indexes:
-            await db.execute(index_sql)
-
-        await db.commit()
+        # 一次下发全部建表和建索引语句
+        await db.executescript(SCHEMA_SQL)
     
+    # 创建检索表等增量结构
+    await migrate_database()
     print(f"数据库初始化完成: {config.DATABASE_PATH}")
 
 
-async def get_or_create_user(mid: str, name: str, face_url: str = None) -> int:
-    """获取或创建用户记录"""
+async def _fetch_upserted_id(db, upsert_sql: str, upsert_params: tuple,
+                             select_sql: str, select_params: tuple) -> int:
+    """执行带 RETURNING id 的 upsert，未发生变化时（DO UPDATE 的 WHERE 不成立）回查ID"""
+    rows = await db.execute_fetchall(upsert_sql, upsert_params)
+    if rows:
+        record_id = rows[0][0]
+    else:
+        rows = await db.execute_fetchall(select_sql, select_params)
+        record_id = rows[0][0]
+    await db.commit()
+    return record_id
+
+
+async def get_or_create_user(mid: str, name: str, face_url: str = None,
+                             now: Optional[datetime] = None) -> int:
+    """获取或创建用户记录，now 为调用方统一的写入时间"""
     async with get_db_connection() as db:
-        now = datetime.now(timezone.utc)
-        cursor = await db.execute("SELECT id, name, face_url FROM users WHERE mid = ?", (mid,))
-        row = await cursor.fetchone()
-        
-        if row:
-            user_id = row["id"]
-            # 更新用户信息
-            if row["name"] != name or row["face_url"] != face_url:
-                await db.execute(
-                    "UPDATE users SET name = ?, face_url = ?, updated_at = ? WHERE id = ?",
-                    (name, face_url, now, user_id)
-                )
-                await db.commit()
-            return user_id
-        else:
-            cursor = await db.execute(
-                "INSERT INTO users (mid, name, face_url, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
-                (mid, name, face_url, now, now)
-            )
-            await db.commit()
-            return cursor.lastrowid
-
-
-async def get_or_create_uploader(mid: str, name: str, face_url: str = None, jump_link: str = None) -> int:
-    """获取或创建UP主记录"""
+        now = to_timestamp_text(now or datetime.now(timezone.utc))
+        return await _fetch_upserted_id(
+            db,
+            """INSERT INTO users (mid, name, face_url, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (mid) DO UPDATE SET
+                   name = excluded.name, face_url = excluded.face_url, updated_at = excluded.updated_at
+               WHERE name IS NOT excluded.name OR face_url IS NOT excluded.face_url
+               RETURNING id""",
+            (mid, name, face_url, now, now),
+            "SELECT id FROM users WHERE mid = ?", (mid,)
+        )
+
+
+async def get_or_create_uploader(mid: str, name: str, face_url: str = None, jump_link: str = None,
+                                 now: Optional[datetime] = None) -> int:
+    """获取或创建UP主记录，now 为调用方统一的写入时间"""
     async with get_db_connection() as db:
-        now = datetime.now(timezone.utc)
-        cursor = await db.execute("SELECT id, name, face_url, jump_link FROM uploaders WHERE mid = ?", (mid,))
-        row = await cursor.fetchone()
-        
-        if row:
-            uploader_id = row["id"]
-            # 更新UP主信息
-            if (row["name"] != name or row["face_url"] != face_url or row["jump_link"] != jump_link):
-                await db.execute(
-                    "UPDATE uploaders SET name = ?, face_url = ?, jump_link = ?, updated_at = ? WHERE id = ?",
-                    (name, face_url, jump_link, now, uploader_id)
-                )
-                await db.commit()
-            return uploader_id
-        else:
-            cursor = await db.execute(
-                "INSERT INTO uploaders (mid, name, face_url, jump_link, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
-                (mid, name, face_url, jump_link, now, now)
-            )
-            await db.commit()
-            return cursor.lastrowid
+        now = to_timestamp_text(now or datetime.now(timezone.utc))
+        return await _fetch_upserted_id(
+            db,
+            """INSERT INTO uploaders (mid, name, face_url, jump_link, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (mid) DO UPDATE SET
+                   name = excluded.name, face_url = excluded.face_url,
+                   jump_link = excluded.jump_link, updated_at = excluded.updated_at
+               WHERE name IS NOT excluded.name OR face_url IS NOT excluded.face_url
+                  OR jump_link IS NOT excluded.jump_link
+               RETURNING id""",
+            (mid, name, face_url, jump_link, now, now),
+            "SELECT id FROM uploaders WHERE mid = ?", (mid,)
+        )
 
 
-async def get_or_create_collection(bilibili_fid: str, title: str, user_mid: str, 
-                                 description: str = None, cover_url: str = None) -> int:
-    """获取或创建收藏夹记录"""
+async def get_uploader_map() -> Dict[str, Tuple[str, str, Optional[str], Optional[str]]]:
+    """读取全部UP主，返回 {mid: (mid, name, face_url, jump_link)}，与 bulk_upsert_uploaders 的参数格式一致"""
+    pool = await get_pool()
+    async with pool.acquire_reader() as db:
+        rows = await db.execute_fetchall("SELECT mid, name, face_url, jump_link FROM uploaders")
+    return {row[0]: tuple(row) for row in rows}
+
+
+async def bulk_upsert_uploaders(uploaders: List[Tuple[str, str, Optional[str], Optional[str]]],
+                                now: Optional[datetime] = None) -> None:
+    """在一个事务中批量写入UP主，uploaders 为 (mid, name, face_url, jump_link) 列表"""
+    if not uploaders:
+        return
+    now = to_timestamp_text(now or datetime.now(timezone.utc))
     async with get_db_connection() as db:
-        now = datetime.now(timezone.utc)
-        cursor = await db.execute("SELECT id, title, description, cover_url FROM collections WHERE bilibili_fid = ?", (bilibili_fid,))
-        row = await cursor.fetchone()
-        
-        if row:
-            collection_id = row["id"]
-            # 更新收藏夹信息
-            if (row["title"] != title or row["description"] != description or row["cover_url"] != cover_url):
-                await db.execute(
-                    "UPDATE collections SET title = ?, description = ?, cover_url = ?, updated_at = ?, last_synced = ? WHERE id = ?",
-                    (title, description, cover_url, now, now, collection_id)
-                )
-                await db.commit()
-            return collection_id
-        else:
-            cursor = await db.execute(
-                """INSERT INTO collections (bilibili_fid, title, user_mid, description, cover_url, 
-                   created_at, updated_at, last_synced) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (bilibili_fid, title, user_mid, description, cover_url, now, now, now)
-            )
-            await db.commit()
-            return cursor.lastrowid
-
-
-async def get_or_create_video(video_data: Dict[str, Any], uploader_id: int) -> int:
-    """获取或创建视频记录"""
+        await db.executemany(
+            """INSERT INTO uploaders (mid, name, face_url, jump_link, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (mid) DO UPDATE SET
+                   name = excluded.name, face_url = excluded.face_url,
+                   jump_link = excluded.jump_link, updated_at = excluded.updated_at
+               WHERE name IS NOT excluded.name OR face_url IS NOT excluded.face_url
+                  OR jump_link IS NOT excluded.jump_link""",
+            [(mid, name, face_url, jump_link, now, now) for mid, name, face_url, jump_link in uploaders]
+        )
+        await db.commit()
+
+
+async def get_or_create_collection(bilibili_fid: str, title: str, user_mid: str, 
+                                 description: str = None, cover_url: str = None,
+                                 now: Optional[datetime] = None) -> int:
+    """获取或创建收藏夹记录，now 为调用方统一的写入时间"""
     async with get_db_connection() as db:
-        now = datetime.now(timezone.utc)
-        bilibili_id = str(video_data["id"])
-        bvid = video_data["bv_id"]
-        
-        cursor = await db.execute(
-            "SELECT id FROM videos WHERE bilibili_id = ? AND bvid = ?", 
-            (bilibili_id, bvid)
+        now = to_timestamp_text(now or datetime.now(timezone.utc))
+        return await _fetch_upserted_id(
+            db,
+            """INSERT INTO collections (bilibili_fid, title, user_mid, description, cover_url, 
+                   created_at, updated_at, last_synced) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (bilibili_fid) DO UPDATE SET
+                   title = excluded.title, description = excluded.description,
+                   cover_url = excluded.cover_url, updated_at = excluded.updated_at,
+                   last_synced = excluded.last_synced
+               WHERE title IS NOT excluded.title OR description IS NOT excluded.description
+                  OR cover_url IS NOT excluded.cover_url
+               RETURNING id""",
+            (bilibili_fid, title, user_mid, description, cover_url, now, now, now),
+            "SELECT id FROM collections WHERE bilibili_fid = ?", (bilibili_fid,)
         )
-        row = await cursor.fetchone()
-        
-        if row:
-            video_id = row["id"]
-            # 更新视频信息
-            await db.execute("""
-                UPDATE videos SET 
-                    title = ?, cover_url = ?, intro = ?, page_count = ?, duration = ?,
-                    attr = ?, ctime = ?, pubtime = ?, first_cid = ?, 
-                    season_info = ?, ogv_info = ?, link = ?, media_list_link = ?,
-                    is_deleted = ?, deleted_at = ?, updated_at = ?
-                WHERE id = ?
-            """, (
-                video_data["title"], video_data["cover"], video_data.get("intro", ""),
-                video_data.get("page", 1), video_data.get("duration", 0),
-                video_data.get("attr", 0), video_data.get("ctime"), video_data.get("pubtime"),
-                video_data.get("ugc", {}).get("first_cid") if video_data.get("ugc") else None,
-                json.dumps(video_data.get("season")) if video_data.get("season") else None,
-                json.dumps(video_data.get("ogv")) if video_data.get("ogv") else None,
-                video_data.get("link"), video_data.get("media_list_link"),
-                video_data.get("is_deleted", False), video_data.get("deleted_at"),
-                now, video_id
-            ))
-            await db.commit()
-            return video_id
-        else:
-            cursor = await db.execute("""
-                INSERT INTO videos (
-                    bilibili_id, bvid, type, title, cover_url, intro, page_count, duration,
-                    uploader_mid, attr, ctime, pubtime, first_cid, season_info, ogv_info,
-                    link, media_list_link, is_deleted, deleted_at, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                bilibili_id, bvid, video_data.get("type", 2), video_data["title"],
-                video_data["cover"], video_data.get("intro", ""), video_data.get("page", 1),
-                video_data.get("duration", 0), video_data["upper"]["mid"],
-                video_data.get("attr", 0), video_data.get("ctime"), video_data.get("pubtime"),
-                video_data.get("ugc", {}).get("first_cid") if video_data.get("ugc") else None,
-                json.dumps(video_data.get("season")) if video_data.get("season") else None,
-                json.dumps(video_data.get("ogv")) if video_data.get("ogv") else None,
-                video_data.get("link"), video_data.get("media_list_link"),
-                video_data.get("is_deleted", False), video_data.get("deleted_at"),
-                now, now
-            ))
-            await db.commit()
-            return cursor.lastrowid
+
+
+async def get_or_create_video(video_data: Dict[str, Any], uploader_id: int,
+                              now: Optional[datetime] = None) -> int:
+    """获取或创建视频记录，now 为调用方统一的写入时间"""
+    async with get_db_connection() as db:
+        now = to_epoch_seconds(now or datetime.now(timezone.utc))
+        rows = await db.execute_fetchall("""
+            INSERT INTO videos (
+                bilibili_id, bvid, type, title, cover_url, intro, page_count, duration,
+                uploader_mid, attr, ctime, pubtime, first_cid, season_info, ogv_info,
+                link, media_list_link, is_deleted, deleted_at, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (bilibili_id, bvid) DO UPDATE SET
+                title = excluded.title, cover_url = excluded.cover_url, intro = excluded.intro,
+                page_count = excluded.page_count, duration = excluded.duration,
+                attr = excluded.attr, ctime = excluded.ctime, pubtime = excluded.pubtime,
+                first_cid = excluded.first_cid, season_info = excluded.season_info,
+                ogv_info = excluded.ogv_info, link = excluded.link,
+                media_list_link = excluded.media_list_link, is_deleted = excluded.is_deleted,
+                deleted_at = excluded.deleted_at, updated_at = excluded.updated_at
+            RETURNING id
+        """, (
+            str(video_data["id"]), video_data["bv_id"], video_data.get("type", 2), video_data["title"],
+            video_data["cover"], video_data.get("intro", ""), video_data.get("page", 1),
+            video_data.get("duration", 0), video_data["upper"]["mid"],
+            video_data.get("attr", 0), video_data.get("ctime"), video_data.get("pubtime"),
+            video_data.get("ugc", {}).get("first_cid") if video_data.get("ugc") else None,
+            json.dumps(video_data.get("season")) if video_data.get("season") else None,
+            json.dumps(video_data.get("ogv")) if video_data.get("ogv") else None,
+            video_data.get("link"), video_data.get("media_list_link"),
+            video_data.get("is_deleted", False), to_epoch_seconds(video_data.get("deleted_at")),
+            now, now
+        ))
+        await db.commit()
+        return rows[0][0]
 
 
 async def add_or_update_collection_video(collection_id: int, video_id: int, 
                                        fav_time: int) -> int:
     """添加或更新收藏记录"""
     async with get_db_connection() as db:
-        now = datetime.now(timezone.utc)
-        
-        cursor = await db.execute(
-            "SELECT id FROM collection_videos WHERE collection_id = ? AND video_id = ?",
-            (collection_id, video_id)
-        )
-        row = await cursor.fetchone()
-        
-        if row:
-            record_id = row["id"]
-            await db.execute("""
-                UPDATE collection_videos SET 
-                    fav_time = ?, last_seen = ?, updated_at = ?
-                WHERE id = ?
-            """, (fav_time, now, now, record_id))
-            await db.commit()
-            return record_id
-        else:
-            cursor = await db.execute("""
-                INSERT INTO collection_videos (
-                    collection_id, video_id, fav_time,
-                    first_seen, last_seen, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (collection_id, video_id, fav_time, now, now, now, now))
-            await db.commit()
-            return cursor.lastrowid
+        now = to_epoch_seconds(datetime.now(timezone.utc))
+        rows = await db.execute_fetchall("""
+            INSERT INTO collection_videos (
+                collection_id, video_id, fav_time,
+                first_seen, last_seen, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (collection_id, video_id) DO UPDATE SET
+                fav_time = excluded.fav_time,
+                last_seen = excluded.last_seen,
+                updated_at = excluded.updated_at
+            RETURNING id
+        """, (collection_id, video_id, fav_time, now, now, now, now))
+        await db.commit()
+        return rows[0][0]
 
 
 async def add_video_stats(video_id: int, cnt_info: Dict[str, Any]) -> int:
     """添加视频统计信息"""
     async with get_db_connection() as db:
-        now = datetime.now(timezone.utc)
+        now = to_timestamp_text(datetime.now(timezone.utc))
         cursor = await db.execute("""
             INSERT INTO video_stats (
                 video_id, collect_count, play_count, danmaku_count, reply_count,
@@ -376,7 +375,7 @@ async def log_deletion(collection_id: int, video_bvid: str, video_title: str,
                       uploader_name: str, reason: str = None):
     """记录删除日志"""
     async with get_db_connection() as db:
-        now = datetime.now(timezone.utc)
+        now = to_timestamp_text(datetime.now(timezone.utc))
         await db.execute("""
             INSERT INTO deletion_logs (
                 collection_id, video_bvid, video_title, uploader_name, deleted_at, reason
@@ -387,5 +386,12 @@ async def log_deletion(collection_id: int, video_bvid: str, video_title: str,
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(initialize_database())
+
+    async def _main():
+        try:
+            await initialize_database()
+        finally:
+            await close_pool()
+
+    asyncio.run(_main())
     print("数据库架构设置完成。您可以检查 bilibili_favorites.db") 
\ No newline at end of file
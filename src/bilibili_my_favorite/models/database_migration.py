@@ -0,0 +1,226 @@
+"""
+数据库迁移
+使用 PRAGMA user_version 记录结构版本，按顺序为已有数据库补齐新增的表、触发器和索引
+"""
+import traceback
+import aiosqlite
+from typing import List, Optional, Set, Tuple
+
+from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.core.db_pool import apply_pragmas
+from bilibili_my_favorite.utils.logger import logger
+
+
+# 迁移步骤: (版本号, 说明, SQL脚本)，版本号必须递增
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, "创建视频全文检索表 videos_fts", """
+    CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(title, uploader_name);
+
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ai AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts (rowid, title, uploader_name)
+        VALUES (new.id, new.title, (SELECT name FROM uploaders WHERE mid = new.uploader_mid));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ad AFTER DELETE ON videos BEGIN
+        DELETE FROM videos_fts WHERE rowid = old.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS videos_fts_au AFTER UPDATE OF title, uploader_mid ON videos BEGIN
+        UPDATE videos_fts
+        SET title = new.title,
+            uploader_name = (SELECT name FROM uploaders WHERE mid = new.uploader_mid)
+        WHERE rowid = new.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS uploaders_fts_au AFTER UPDATE OF name ON uploaders BEGIN
+        UPDATE videos_fts SET uploader_name = new.name
+        WHERE rowid IN (SELECT id FROM videos WHERE uploader_mid = new.mid);
+    END;
+
+    DELETE FROM videos_fts;
+    INSERT INTO videos_fts (rowid, title, uploader_name)
+    SELECT v.id, v.title, u.name
+    FROM videos v
+    LEFT JOIN uploaders u ON v.uploader_mid = u.mid;
+    """),
+    (2, "任务表时间字段改为 INTEGER 毫秒时间戳", """
+    CREATE TABLE IF NOT EXISTS tasks (
+        task_id TEXT PRIMARY KEY,
+        task_type TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT DEFAULT '',
+        status TEXT NOT NULL DEFAULT 'pending',
+        progress_data TEXT DEFAULT '{}',
+        result_data TEXT DEFAULT NULL,
+        parameters TEXT NOT NULL DEFAULT '{}',
+        created_at TEXT NOT NULL,
+        started_at TEXT DEFAULT NULL,
+        completed_at TEXT DEFAULT NULL,
+        updated_at TEXT NOT NULL,
+        priority INTEGER DEFAULT 0,
+        max_retries INTEGER DEFAULT 3,
+        retry_count INTEGER DEFAULT 0,
+        timeout INTEGER DEFAULT NULL
+    );
+
+    CREATE TABLE tasks_new (
+        task_id TEXT PRIMARY KEY,
+        task_type TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT DEFAULT '',
+        status TEXT NOT NULL DEFAULT 'pending',
+        progress_data TEXT DEFAULT '{}',
+        result_data TEXT DEFAULT NULL,
+        parameters TEXT NOT NULL DEFAULT '{}',
+        created_at INTEGER NOT NULL,
+        started_at INTEGER DEFAULT NULL,
+        completed_at INTEGER DEFAULT NULL,
+        updated_at INTEGER NOT NULL,
+        priority INTEGER DEFAULT 0,
+        max_retries INTEGER DEFAULT 3,
+        retry_count INTEGER DEFAULT 0,
+        timeout INTEGER DEFAULT NULL
+    );
+
+    -- 原值为本地时间的 ISO 字符串，转换为 UTC 毫秒时间戳
+    INSERT INTO tasks_new
+    SELECT task_id, task_type, title, description, status,
+           progress_data, result_data, parameters,
+           CASE WHEN typeof(created_at) = 'text' THEN CAST(ROUND((julianday(created_at, 'utc') - 2440587.5) * 86400000) AS INTEGER) ELSE created_at END,
+           CASE WHEN typeof(started_at) = 'text' THEN CAST(ROUND((julianday(started_at, 'utc') - 2440587.5) * 86400000) AS INTEGER) ELSE started_at END,
+           CASE WHEN typeof(completed_at) = 'text' THEN CAST(ROUND((julianday(completed_at, 'utc') - 2440587.5) * 86400000) AS INTEGER) ELSE completed_at END,
+           CASE WHEN typeof(updated_at) = 'text' THEN CAST(ROUND((julianday(updated_at, 'utc') - 2440587.5) * 86400000) AS INTEGER) ELSE updated_at END,
+           priority, max_retries, retry_count, timeout
+    FROM tasks;
+
+    DROP TABLE tasks;
+    ALTER TABLE tasks_new RENAME TO tasks;
+
+    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+    CREATE INDEX IF NOT EXISTS idx_tasks_type ON tasks(task_type);
+    CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+    CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority DESC);
+    """),
+    (3, "收藏夹视频列表排序索引", """
+    CREATE INDEX IF NOT EXISTS idx_cv_collection_favtime
+    ON collection_videos (collection_id, fav_time DESC, video_id);
+    """),
+    (4, "视频全文检索表改用 trigram 分词，支持中文子串搜索", """
+    DROP TABLE IF EXISTS videos_fts;
+    CREATE VIRTUAL TABLE videos_fts USING fts5(title, uploader_name, tokenize = 'trigram');
+
+    INSERT INTO videos_fts (rowid, title, uploader_name)
+    SELECT v.id, v.title, u.name
+    FROM videos v
+    LEFT JOIN uploaders u ON v.uploader_mid = u.mid;
+    """),
+    (5, "官方影视作品部分索引", """
+    CREATE INDEX IF NOT EXISTS idx_videos_has_ogv
+    ON videos (created_at DESC, id DESC)
+    WHERE ogv_info IS NOT NULL AND ogv_info != '';
+    """),
+    (6, "可用视频部分索引", """
+    CREATE INDEX IF NOT EXISTS idx_videos_available ON videos (id) WHERE is_deleted = 0;
+    """),
+    (7, "视频与收藏关系的时间字段改为秒级时间戳", """
+    -- 原值为 ISO 字符串或 CURRENT_TIMESTAMP，均按 UTC 解析
+    -- 改写 created_at 前先删除包含该列的索引，更新完成后一次性重建
+    DROP INDEX IF EXISTS idx_videos_has_ogv;
+    UPDATE videos SET created_at = CAST(strftime('%s', created_at) AS INTEGER) WHERE typeof(created_at) = 'text';
+    UPDATE videos SET updated_at = CAST(strftime('%s', updated_at) AS INTEGER) WHERE typeof(updated_at) = 'text';
+    UPDATE videos SET deleted_at = CAST(strftime('%s', deleted_at) AS INTEGER) WHERE typeof(deleted_at) = 'text';
+    UPDATE collection_videos SET first_seen = CAST(strftime('%s', first_seen) AS INTEGER) WHERE typeof(first_seen) = 'text';
+    UPDATE collection_videos SET last_seen = CAST(strftime('%s', last_seen) AS INTEGER) WHERE typeof(last_seen) = 'text';
+    UPDATE collection_videos SET created_at = CAST(strftime('%s', created_at) AS INTEGER) WHERE typeof(created_at) = 'text';
+    UPDATE collection_videos SET updated_at = CAST(strftime('%s', updated_at) AS INTEGER) WHERE typeof(updated_at) = 'text';
+    CREATE INDEX IF NOT EXISTS idx_videos_has_ogv
+    ON videos (created_at DESC, id DESC)
+    WHERE ogv_info IS NOT NULL AND ogv_info != '';
+    """),
+    (8, "收藏夹记录上次完整同步时间", """
+    -- UTC 秒级时间戳；增量同步距上次完整同步过久时会改为完整同步
+    ALTER TABLE collections ADD COLUMN last_full_sync INTEGER;
+    """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# 已确认处于最新版本的数据库路径，之后的检查不必再打开连接
+_up_to_date: Set[str] = set()
+
+
+async def _get_schema_version(db: aiosqlite.Connection) -> Optional[int]:
+    """一次查询读取 videos 表是否存在和当前结构版本，未初始化时返回 None"""
+    cursor = await db.execute(
+        "SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'videos'), "
+        "(SELECT user_version FROM pragma_user_version)"
+    )
+    has_videos, version = await cursor.fetchone()
+    return version if has_videos else None
+
+
+async def check_migration_needed() -> bool:
+    """检查数据库是否需要迁移"""
+    if not config.DATABASE_PATH.exists():
+        return False
+    if str(config.DATABASE_PATH) in _up_to_date:
+        return False
+    async with aiosqlite.connect(config.DATABASE_PATH) as db:
+        await apply_pragmas(db)
+        current_version = await _get_schema_version(db)
+        if current_version is None:
+            return False
+        if current_version < LATEST_VERSION:
+            return True
+    _up_to_date.add(str(config.DATABASE_PATH))
+    return False
+
+
+async def migrate_database() -> bool:
+    """执行尚未应用的迁移步骤，返回是否进行了迁移"""
+    if not config.DATABASE_PATH.exists():
+        return False
+    if str(config.DATABASE_PATH) in _up_to_date:
+        return False
+
+    async with aiosqlite.connect(config.DATABASE_PATH) as db:
+        # 与连接池相同的WAL等配置，迁移中的大量写入不再每条语句都fsync
+        await apply_pragmas(db)
+        current_version = await _get_schema_version(db)
+        if current_version is None:
+            logger.warning("数据库尚未初始化，跳过迁移")
+            return False
+
+        pending = [m for m in MIGRATIONS if m[0] > current_version]
+        if not pending:
+            _up_to_date.add(str(config.DATABASE_PATH))
+            return False
+
+        for version, description, _ in pending:
+            logger.info(f"应用数据库迁移 v{version}: {description}")
+
+        # 所有待执行步骤和版本号更新放在同一个 BEGIN IMMEDIATE 事务中，只提交一次；
+        # executescript 会先提交已开启的事务，因此 BEGIN/COMMIT 写在脚本内
+        script = "\n".join(
+            ["BEGIN IMMEDIATE;"]
+            + [step_script for _, _, step_script in pending]
+            + [f"PRAGMA user_version = {LATEST_VERSION};", "COMMIT;"]
+        )
+        try:
+            await db.executescript(script)
+        except Exception as e:
+            error_traceback = traceback.format_exc()
+            logger.error(f"数据库迁移失败，已回滚: {e}\n错误栈:\n{error_traceback}")
+            if db.in_transaction:
+                await db.execute("ROLLBACK")
+            raise
+
+        # 新增索引后刷新统计信息，让查询规划器能选中新索引
+        await db.executescript("ANALYZE videos; ANALYZE collection_videos; PRAGMA optimize;")
+        cursor = await db.execute("SELECT COUNT(*) FROM sqlite_stat1")
+        stat_count = (await cursor.fetchone())[0]
+        logger.info(f"已更新查询规划统计信息，sqlite_stat1 记录数: {stat_count}")
+
+    _up_to_date.add(str(config.DATABASE_PATH))
+    logger.info(f"数据库迁移完成，当前版本: v{LATEST_VERSION}")
+    return True
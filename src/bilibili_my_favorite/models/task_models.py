@@ -7,7 +7,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, Optional, Union, List
 import json
-import uuid
+from secrets import token_hex
 
 # 导入TypedDict类型
 from .types import (
@@ -16,6 +16,15 @@ from .types import (
 )
 
 
+def _parse_datetime(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """解析时间字段，兼容 ISO 字符串和 datetime 对象"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
 class TaskStatus(Enum):
     """任务状态枚举"""
     PENDING = "pending"           # 等待执行
@@ -35,7 +44,12 @@ class TaskType(Enum):
     IMPORT_DATA = "import_data"          # 数据导入
 
 
-@dataclass
+# 按字符串值查找枚举成员，比调用 TaskType(value)/TaskStatus(value) 快
+TASK_TYPE_BY_VALUE: Dict[str, TaskType] = {t.value: t for t in TaskType}
+TASK_STATUS_BY_VALUE: Dict[str, TaskStatus] = {s.value: s for s in TaskStatus}
+
+
+@dataclass(slots=True)
 class TaskProgress:
     """任务进度信息"""
     current: int = 0              # 当前进度
@@ -45,7 +59,7 @@ class TaskProgress:
     sub_tasks: Dict[str, Any] = field(default_factory=dict)  # 子任务进度
 
 
-@dataclass
+@dataclass(slots=True)
 class TaskResult:
     """任务执行结果"""
     success: bool                 # 是否成功
@@ -56,10 +70,10 @@ class TaskResult:
     statistics: Dict[str, Any] = field(default_factory=dict)  # 统计信息
 
 
-@dataclass
+@dataclass(slots=True)
 class BaseTask:
     """任务基类"""
-    task_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    task_id: str = field(default_factory=lambda: token_hex(16))  # 32位十六进制随机ID
     task_type: TaskType = TaskType.VIDEO_DOWNLOAD
     title: str = ""               # 任务标题
     description: str = ""         # 任务描述
@@ -86,46 +100,53 @@ class BaseTask:
     
     def to_dict(self) -> TaskStatusDict:
         """转换为字典格式"""
-        return TaskStatusDict(
-            task_id=self.task_id,
-            task_type=self.task_type.value,
-            title=self.title,
-            description=self.description,
-            status=self.status.value,
-            progress=TaskProgressDict(
-                current=self.progress.current,
-                total=self.progress.total,
-                percentage=self.progress.percentage,
-                message=self.progress.message
-            ),
-            result=TaskResultDict(
-                success=self.result.success if self.result else False,
-                data=self.result.data if self.result else None,
-                error_message=self.result.error_message if self.result else None,
-                error_code=self.result.error_code if self.result else None,
-                output_files=self.result.output_files if self.result else [],
-                statistics=self.result.statistics if self.result else {}
-            ) if self.result else None,
-            parameters=self.parameters,
-            created_at=self.created_at.isoformat(),
-            started_at=self.started_at.isoformat() if self.started_at else None,
-            completed_at=self.completed_at.isoformat() if self.completed_at else None,
-            updated_at=self.updated_at.isoformat(),
-            priority=self.priority,
-            max_retries=self.max_retries,
-            retry_count=self.retry_count,
-            timeout=self.timeout
-        )
+        result = self.result
+        progress = self.progress
+        started_at = self.started_at
+        completed_at = self.completed_at
+        # 直接使用字典字面量，避免 TypedDict(...) 关键字参数调用的开销
+        progress_dict: TaskProgressDict = {
+            "current": progress.current,
+            "total": progress.total,
+            "percentage": progress.percentage,
+            "message": progress.message,
+        }
+        result_dict: Optional[TaskResultDict] = {
+            "success": result.success,
+            "data": result.data,
+            "error_message": result.error_message,
+            "error_code": result.error_code,
+            "output_files": result.output_files,
+            "statistics": result.statistics,
+        } if result is not None else None
+        return {
+            "task_id": self.task_id,
+            "task_type": self.task_type.value,
+            "title": self.title,
+            "description": self.description,
+            "status": self.status.value,
+            "progress": progress_dict,
+            "result": result_dict,
+            "parameters": self.parameters,
+            "created_at": self.created_at.isoformat(),
+            "started_at": started_at.isoformat() if started_at else None,
+            "completed_at": completed_at.isoformat() if completed_at else None,
+            "updated_at": self.updated_at.isoformat(),
+            "priority": self.priority,
+            "max_retries": self.max_retries,
+            "retry_count": self.retry_count,
+            "timeout": self.timeout,
+        }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'BaseTask':
         """从字典创建任务实例"""
         task = cls()
         task.task_id = data.get("task_id", task.task_id)
-        task.task_type = TaskType(data.get("task_type", TaskType.VIDEO_DOWNLOAD.value))
+        task.task_type = TASK_TYPE_BY_VALUE.get(data.get("task_type"), TaskType.VIDEO_DOWNLOAD)
         task.title = data.get("title", "")
         task.description = data.get("description", "")
-        task.status = TaskStatus(data.get("status", TaskStatus.PENDING.value))
+        task.status = TASK_STATUS_BY_VALUE.get(data.get("status"), TaskStatus.PENDING)
         
         # 恢复进度信息
         progress_data = data.get("progress", {})
@@ -152,10 +173,10 @@ class BaseTask:
         task.parameters = data.get("parameters", {})
         
         # 恢复时间信息
-        task.created_at = datetime.fromisoformat(data["created_at"]) if data.get("created_at") else datetime.now()
-        task.started_at = datetime.fromisoformat(data["started_at"]) if data.get("started_at") else None
-        task.completed_at = datetime.fromisoformat(data["completed_at"]) if data.get("completed_at") else None
-        task.updated_at = datetime.fromisoformat(data["updated_at"]) if data.get("updated_at") else datetime.now()
+        task.created_at = _parse_datetime(data.get("created_at")) or datetime.now()
+        task.started_at = _parse_datetime(data.get("started_at"))
+        task.completed_at = _parse_datetime(data.get("completed_at"))
+        task.updated_at = _parse_datetime(data.get("updated_at")) or datetime.now()
         
         task.priority = data.get("priority", 0)
         task.max_retries = data.get("max_retries", 3)
@@ -163,6 +184,31 @@ class BaseTask:
         task.timeout = data.get("timeout")
         
         return task
+    
+    @classmethod
+    def _from_row_fast(cls, row: Any, progress: TaskProgress, result: Optional[TaskResult],
+                       parameters: Dict[str, Any]) -> 'BaseTask':
+        """从 tasks 表记录直接构建任务，跳过 __init__ 和 from_dict 的默认值处理（时间字段为毫秒时间戳）"""
+        started_at = row["started_at"]
+        completed_at = row["completed_at"]
+        task = cls.__new__(cls)
+        task.task_id = row["task_id"]
+        task.task_type = TASK_TYPE_BY_VALUE[row["task_type"]]
+        task.title = row["title"]
+        task.description = row["description"]
+        task.status = TASK_STATUS_BY_VALUE[row["status"]]
+        task.progress = progress
+        task.result = result
+        task.parameters = parameters
+        task.created_at = datetime.fromtimestamp(row["created_at"] / 1000)
+        task.started_at = datetime.fromtimestamp(started_at / 1000) if started_at is not None else None
+        task.completed_at = datetime.fromtimestamp(completed_at / 1000) if completed_at is not None else None
+        task.updated_at = datetime.fromtimestamp(row["updated_at"] / 1000)
+        task.priority = row["priority"]
+        task.max_retries = row["max_retries"]
+        task.retry_count = row["retry_count"]
+        task.timeout = row["timeout"]
+        return task
 
 
 @dataclass
@@ -185,9 +185,9 @@ class VideoDict(TypedDict):
     is_deleted: bool
     delete_reason: Optional[str]
     video_type: str
-    last_seen: Optional[str]
-    created_at: str
-    updated_at: str
+    last_seen: Optional[int]  # UTC 秒级时间戳
+    created_at: int
+    updated_at: int
 
 
 class DeletedVideoDict(TypedDict):
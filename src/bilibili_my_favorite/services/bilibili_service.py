@@ -4,13 +4,21 @@ B站API服务
 """
 import asyncio
 import random
-from typing import List, Dict, Any, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
 from ..core.config import config
 from ..core.credential import SuperCredential
 from ..utils.logger import logger
+from ..utils.rate_limit import TokenBucket
 
-from bilibili_api import favorite_list, video
+from bilibili_api import Credential, favorite_list, request_settings, select_client, video
+from bilibili_api.exceptions import NetworkException, ResponseCodeException
 
+T = TypeVar("T")
+
+# 可重试的B站接口错误码：-412 请求被拦截，-509/-799 请求过于频繁
+RETRYABLE_CODES = frozenset((-412, -509, -799))
+# 可重试的HTTP状态码：限流和服务端临时错误
+RETRYABLE_STATUS = frozenset((412, 429, 500, 502, 503, 504))
 
 
 class BilibiliService:
@@ -19,6 +27,15 @@ class BilibiliService:
     def __init__(self):
         self.credential = None
         self._initialized = False
+        # 所有B站接口请求共用的限流器（包括并发获取的分页和收藏夹），
+        # 相邻请求间隔在 REQUEST_DELAY ~ REQUEST_DELAY_MAX 毫秒之间随机，允许 REQUEST_BURST 个突发
+        min_delay = max(1, config.REQUEST_DELAY)
+        max_delay = max(min_delay, config.REQUEST_DELAY_MAX)
+        self.rate_limiter = TokenBucket(
+            rate=2000 / (min_delay + max_delay),
+            capacity=max(1, config.REQUEST_BURST),
+            jitter=(max_delay - min_delay) / (max_delay + min_delay)
+        )
     
     def _setup_client(self):
         """设置B站API客户端"""
@@ -26,8 +43,6 @@ class BilibiliService:
             return
             
         try:
-            from bilibili_api import Credential, select_client, request_settings
-            
             select_client("curl_cffi")
             request_settings.set("impersonate", "chrome136")
             
@@ -51,6 +66,38 @@ class BilibiliService:
             logger.error(f"初始化B站API客户端失败: {e}")
             raise
     
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """返回第 attempt 次失败后重试前的等待秒数，错误不可重试时返回 None"""
+        if isinstance(error, ResponseCodeException):
+            if error.code not in RETRYABLE_CODES:
+                return None
+        elif isinstance(error, NetworkException):
+            if error.status not in RETRYABLE_STATUS:
+                return None
+        elif not isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return None
+        
+        # 响应带有 Retry-After 时按服务端要求等待，否则指数退避并加少量抖动
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            return float(headers["Retry-After"])
+        except (KeyError, TypeError, ValueError):
+            return config.API_RETRY_BASE_DELAY * 2 ** attempt + random.random() * 0.1
+    
+    async def call_api(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """经过限流器调用B站接口，遇到网络错误或限流时指数退避重试"""
+        attempts = max(1, config.API_MAX_RETRIES)
+        for attempt in range(attempts):
+            await self.rate_limiter.acquire()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt) if attempt + 1 < attempts else None
+                if delay is None:
+                    raise
+                logger.warning(f"请求 {func.__name__} 失败: {e}，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+                await asyncio.sleep(delay)
+    
     def is_authenticated(self) -> bool:
         """检查是否已认证"""
         if not self._initialized:
@@ -75,8 +122,8 @@ class BilibiliService:
             raise ValueError("未设置用户ID")
         
         try:
-            response = await favorite_list.get_video_favorite_list(
-                uid=uid, credential=self.credential
+            response = await self.call_api(
+                favorite_list.get_video_favorite_list, uid=uid, credential=self.credential
             )
 
             if not response or not response.get("list"):
@@ -91,23 +138,23 @@ class BilibiliService:
             logger.error(f"获取收藏夹列表失败: {e}")
             raise
     
-    async def get_favorite_videos(self, favorite_id: int, 
-                                max_pages: int = None) -> List[Dict[str, Any]]:
+    async def iter_favorite_pages(self, favorite_id: int,
+                                  max_pages: int = None) -> AsyncIterator[List[Dict[str, Any]]]:
         """
-        获取收藏夹中的所有视频
+        逐页获取收藏夹中的视频，每获取一页立即产出该页的视频列表
         
         Args:
             favorite_id: 收藏夹ID
             max_pages: 最大页数限制
             
-        Returns:
-            视频列表
+        Yields:
+            单页视频列表
         """
         if not self.is_authenticated():
             raise ValueError("未设置B站API凭据")
         
         max_pages = max_pages or config.MAX_PAGES_PER_COLLECTION
-        all_videos = []
+        total = 0
         page = 1
         has_more = True
         
@@ -115,37 +162,66 @@ class BilibiliService:
         
         while has_more and page <= max_pages:
             try:
-                from bilibili_api import favorite_list
-                
-                result = await favorite_list.get_video_favorite_list_content(
+                result = await self.call_api(
+                    favorite_list.get_video_favorite_list_content,
                     media_id=favorite_id, page=page, credential=self.credential
                 )
-                
-                if not result.get("medias"):
-                    logger.info(f"收藏夹 {favorite_id} 第 {page} 页无更多视频")
-                    break
-                
-                videos = result["medias"]
-                all_videos.extend(videos)
-                
-                logger.info(f"收藏夹 {favorite_id} 第 {page} 页获取到 {len(videos)} 个视频，"
-                          f"总计: {len(all_videos)}")
-                
-                has_more = result.get("has_more", False)
-                page += 1
-                
-                # 添加请求延迟
-                if has_more and page <= max_pages:
-                    await asyncio.sleep(random.randint(config.REQUEST_DELAY, config.REQUEST_DELAY *6) / 1000)
-                    
             except Exception as e:
                 logger.error(f"获取收藏夹 {favorite_id} 第 {page} 页失败: {e}")
                 break
+            
+            if not result.get("medias"):
+                logger.info(f"收藏夹 {favorite_id} 第 {page} 页无更多视频")
+                break
+            
+            videos = result["medias"]
+            total += len(videos)
+            
+            logger.info(f"收藏夹 {favorite_id} 第 {page} 页获取到 {len(videos)} 个视频，"
+                      f"总计: {total}")
+            
+            yield videos
+            
+            has_more = result.get("has_more", False)
+            page += 1
         
         if page > max_pages:
             logger.warning(f"收藏夹 {favorite_id} 超过最大页数限制 {max_pages}，停止获取")
         
-        logger.info(f"收藏夹 {favorite_id} 共获取到 {len(all_videos)} 个视频")
+        logger.info(f"收藏夹 {favorite_id} 共获取到 {total} 个视频")
+    
+    async def iter_favorite_videos(self, favorite_id: int,
+                                   max_pages: int = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐个产出收藏夹中的视频，调用方无需等待全部页面
+        
+        Args:
+            favorite_id: 收藏夹ID
+            max_pages: 最大页数限制
+            
+        Yields:
+            视频信息
+        """
+        async for videos in self.iter_favorite_pages(favorite_id, max_pages):
+            for video_item in videos:
+                yield video_item
+    
+    async def get_favorite_videos(self, favorite_id: int, 
+                                max_pages: int = None) -> List[Dict[str, Any]]:
+        """
+        获取收藏夹中的所有视频
+        
+        Args:
+            favorite_id: 收藏夹ID
+            max_pages: 最大页数限制
+            
+        Returns:
+            视频列表
+        """
+        # 按页整体 extend，不必逐个视频经过异步生成器
+        all_videos = []
+        async for videos in self.iter_favorite_pages(favorite_id, max_pages):
+            all_videos.extend(videos)
         return all_videos
     
     async def get_video_info(self, bvid: str) -> Optional[Dict[str, Any]]:
@@ -182,21 +258,18 @@ class BilibiliService:
         Returns:
             {favorite_id: videos} 字典
         """
-        results = {}
+        # 有限并发地获取，网络等待期间可以同时处理其他收藏夹；请求频率由 rate_limiter 统一控制
+        semaphore = asyncio.Semaphore(max(1, config.MAX_CONCURRENT_FAVORITES))
         
-        for favorite_id in favorite_ids:
-            try:
-                videos = await self.get_favorite_videos(favorite_id)
-                results[favorite_id] = videos
-                
-                # 添加收藏夹间的延迟
-                if favorite_id != favorite_ids[-1]:
-                    await asyncio.sleep(random.randint(config.REQUEST_DELAY, config.REQUEST_DELAY *6) / 1000)
-                    
-            except Exception as e:
-                logger.error(f"批量获取收藏夹 {favorite_id} 失败: {e}")
-                results[favorite_id] = []
+        async def fetch_one(favorite_id: int):
+            async with semaphore:
+                try:
+                    return favorite_id, await self.get_favorite_videos(favorite_id)
+                except Exception as e:
+                    logger.error(f"批量获取收藏夹 {favorite_id} 失败: {e}")
+                    return favorite_id, []
         
+        results = dict(await asyncio.gather(*(fetch_one(favorite_id) for favorite_id in favorite_ids)))
         return results
 
 
@@ -3,32 +3,61 @@
 实现三步式同步流程以减少API调用
 """
 import asyncio
+import itertools
 import json
-import random
+import math
 import traceback
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple
 from pathlib import Path
 
-from .sync_context import SyncContext
+from bilibili_api import favorite_list
+
+from .sync_context import SyncContext, collections_by_id
 from .bilibili_service import bilibili_service
 from ..dao.collection_dao import collection_dao
 from ..dao.video_dao import video_dao
 from ..models.database import (
-    get_or_create_user, get_or_create_uploader, get_or_create_collection,
+    get_or_create_user, bulk_upsert_uploaders, get_uploader_map, get_or_create_collection,
     get_or_create_video, add_or_update_collection_video, add_video_stats,
-    log_deletion, initialize_database
+    initialize_database
 )
 from ..utils.downloader import cover_downloader
 from ..utils.logger import logger
 from ..core.config import config
 
 
+# 处理入库时每批的视频数量
+PROCESS_BATCH_SIZE = 500
+
+# 复用同一个编码器；json.dumps 传入非默认参数时每次调用都会新建 JSONEncoder
+_json_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+# 失效视频标题中出现的特征文本，每个视频都要检查，只构建一次
+_DELETED_TITLE_MARKERS = (
+    "已失效视频",
+    "视频已失效",
+    "内容已失效",
+    "该视频已失效",
+    "视频不存在",
+    "视频已被删除",
+)
+# 整个标题就是失效标识，不能作为恢复后的标题
+_DELETED_TITLES = frozenset(("已失效视频", "视频已失效", "内容已失效"))
+
+
+def _oldest_fav_time(videos: Sequence[Dict[str, Any]]) -> Optional[int]:
+    """一页视频中最早的收藏时间"""
+    return min((fav_time for video in videos if (fav_time := video.get("fav_time")) is not None), default=None)
+
+
 class OptimizedSyncService:
     """优化的同步服务类"""
     
     def __init__(self):
         self.context: Optional[SyncContext] = None
+        # 本次同步已写入数据库的UP主 {mid: (mid, name, face_url, jump_link)}，未变化的不再重复写入
+        self._uploader_cache: Dict[str, tuple] = {}
     
     async def sync_all_favorites(self, uid: str = None, resume_task_id: str = None) -> Dict[str, Any]:
         """
@@ -41,6 +70,7 @@ class OptimizedSyncService:
         Returns:
             同步统计信息
         """
+        self.context = None
         try:
             # 步骤1: 初始化或恢复同步上下文
             if resume_task_id:
@@ -92,6 +122,13 @@ class OptimizedSyncService:
                     "errors": [f"同步失败: {e}"],
                     "deleted_videos": []
                 }
+        finally:
+            # 关闭本次同步复用的封面下载连接
+            await cover_downloader.close()
+            if self.context:
+                # 写入延迟保存中的进度并关闭写线程，之后再释放进程锁
+                self.context.close()
+                self.context.release_lock()
     
     async def sync_single_collection(self, bilibili_fid: str) -> Dict[str, Any]:
         """
@@ -103,6 +140,7 @@ class OptimizedSyncService:
         Returns:
             同步统计信息
         """
+        self.context = None
         try:
             # 获取收藏夹信息
             collections = await bilibili_service.get_favorite_lists()
@@ -116,9 +154,11 @@ class OptimizedSyncService:
             if not collection_data:
                 raise ValueError(f"未找到收藏夹 {bilibili_fid}")
             
-            # 创建单个收藏夹的同步上下文
-            self.context = SyncContext()
-            self.context.collections_to_process = [collection_data]
+            # 创建单个收藏夹的同步上下文，取得进程锁后才会写锁文件
+            context = SyncContext()
+            context.acquire_lock()
+            self.context = context
+            self.context.collections_to_process = collections_by_id([collection_data])
             self.context.update_status("fetching")
             
             # 获取收藏夹数据
@@ -160,6 +200,13 @@ class OptimizedSyncService:
                     "errors": [f"同步收藏夹 {bilibili_fid} 失败: {e}"],
                     "deleted_videos": []
                 }
+        finally:
+            # 关闭本次同步复用的封面下载连接
+            await cover_downloader.close()
+            if self.context:
+                # 写入延迟保存中的进度并关闭写线程，之后再释放进程锁
+                self.context.close()
+                self.context.release_lock()
     
     async def list_sync_tasks(self) -> List[Dict[str, Any]]:
         """列出所有同步任务"""
@@ -167,7 +214,7 @@ class OptimizedSyncService:
         tasks = []
         
         try:
-            context = SyncContext.load_from_lock_file(lock_file)
+            context = await asyncio.to_thread(SyncContext.load_from_lock_file, lock_file)
             tasks.append(context.get_progress_info())
         except Exception as e:
             logger.error(f"加载任务信息失败: {e}")
@@ -183,7 +230,7 @@ class OptimizedSyncService:
         try:
             lock_file = SyncContext.find_existing_lock_file()
             if lock_file:
-                context = SyncContext.load_from_lock_file(lock_file)
+                context = await asyncio.to_thread(SyncContext.load_from_lock_file, lock_file)
                 context.update_status("cancelled")
                 context.cleanup()
                 logger.info(f"任务 {task_id} 已取消")
@@ -206,17 +253,23 @@ class OptimizedSyncService:
         # 确保必要目录存在
         config.ensure_actual_directories()
         
-        # 创建同步上下文
+        # 创建同步上下文，取得进程锁后才会写锁文件
         context = SyncContext()
-        context.update_status("initializing")
-        
-        # 获取收藏夹列表
-        collections = await bilibili_service.get_favorite_lists(uid)
-        if not collections:
-            raise ValueError("未获取到收藏夹列表")
-        
-        context.collections_to_process = collections
-        context.save_lock_file()
+        context.acquire_lock()
+        try:
+            context.update_status("initializing")
+            
+            # 获取收藏夹列表
+            collections = await bilibili_service.get_favorite_lists(uid)
+            if not collections:
+                raise ValueError("未获取到收藏夹列表")
+            
+            context.collections_to_process = collections_by_id(collections)
+            context.save_lock_file()
+        except Exception:
+            # 上下文还没有交给调用方，这里释放进程锁
+            context.release_lock()
+            raise
         
         logger.info(f"初始化完成，共有 {len(collections)} 个收藏夹待处理")
         return context
@@ -236,116 +289,150 @@ class OptimizedSyncService:
             raise ValueError(f"未找到任务 {task_id} 的锁文件")
         
         # 加载同步上下文
-        context = SyncContext.load_from_lock_file(target_lock_file)
+        context = await asyncio.to_thread(SyncContext.load_from_lock_file, target_lock_file)
         
         if not context.is_resumable():
             raise ValueError(f"任务 {task_id} 不可恢复，状态: {context.status}")
+        context.acquire_lock()
         
         logger.info(f"任务恢复成功，状态: {context.status}")
         return context
     
     async def _fetch_all_collections_data(self):
-        """获取所有收藏夹的数据"""
+        """获取所有收藏夹的数据，多个收藏夹有限并发地获取"""
         logger.info("开始获取所有收藏夹数据")
         self.context.update_status("fetching")
         
-        # 如果有当前正在处理的收藏夹，从它开始
-        if self.context.current_collection:
-            # 继续处理当前收藏夹
-            current_collection_id = str(self.context.current_collection.get('id'))
-            await self._fetch_single_collection_data(
-                self.context.current_collection, 
-                start_page=self.context.current_page
-            )
-            # 数据拉取完成后，标记该收藏夹数据拉取完成
-            self.context.mark_collection_data_fetched(current_collection_id)
+        semaphore = asyncio.Semaphore(max(1, config.MAX_CONCURRENT_COLLECTIONS))
+        
+        async def fetch_collection(collection_data: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    collection_id = str(collection_data.get('id'))
+                    await self._fetch_single_collection_data(collection_data)
+                    
+                    # 数据拉取完成后，标记该收藏夹数据拉取完成
+                    self.context.mark_collection_data_fetched(collection_id)
+                    
+                except Exception as e:
+                    error_msg = f"获取收藏夹 {collection_data.get('title', 'Unknown')} 数据失败: {e}"
+                    logger.error(error_msg)
+                    self.context.mark_collection_failed(collection_data, str(e))
         
         # 处理剩余的收藏夹
         # 使用副本遍历，避免在遍历过程中修改列表
-        collections_copy = self.context.collections_to_process.copy()
-        for collection_data in collections_copy:
-            try:
-                collection_id = str(collection_data.get('id'))
-                self.context.set_current_collection(collection_data)
-                await self._fetch_single_collection_data(collection_data)
-                
-                # 数据拉取完成后，标记该收藏夹数据拉取完成
-                self.context.mark_collection_data_fetched(collection_id)
-                
-            except Exception as e:
-                error_msg = f"获取收藏夹 {collection_data.get('title', 'Unknown')} 数据失败: {e}"
-                logger.error(error_msg)
-                self.context.mark_collection_failed(collection_data, str(e))
+        collections_copy = list(self.context.collections_to_process.values())
+        await asyncio.gather(*(fetch_collection(collection_data) for collection_data in collections_copy))
         
         logger.info("所有收藏夹数据获取完成")
     
-    async def _fetch_single_collection_data(self, collection_data: Dict[str, Any], start_page: int = 1):
-        """获取单个收藏夹的数据"""
+    async def _fetch_single_collection_data(self, collection_data: Dict[str, Any]):
+        """获取单个收藏夹的数据：先顺序请求一页得到每页数量，再按收藏数并发请求其余页
+        
+        每个收藏夹在上下文中单独记录已保存的页数，中断恢复时从各自的下一页继续
+        """
         collection_id = str(collection_data["id"])
         title = collection_data["title"]
         
-        logger.info(f"获取收藏夹数据: {title} (ID: {collection_id})")
+        page = self.context.fetched_pages.get(collection_id, 0) + 1
+        logger.info(f"获取收藏夹数据: {title} (ID: {collection_id})，从第 {page} 页开始")
         
-        page = start_page
         has_more = True
         max_pages = config.MAX_PAGES_PER_COLLECTION
+        semaphore = asyncio.Semaphore(max(1, config.MAX_CONCURRENT_PAGES))
+        
+        async def fetch_page(page_number: int):
+            async with semaphore:
+                return await self._fetch_collection_page(collection_id, title, page_number)
+        
+        # 增量同步：分页按收藏时间倒序，顺序获取到包含已入库收藏时间的一页为止，之后的数据库中都已存在。
+        # 游标在获取前从库中取得并记入锁文件，恢复时沿用；入库在所有收藏夹获取完成后才开始，
+        # 因此游标之后的视频都是本次同步之前已写入的
+        cursor = self.context.fav_time_cursors.get(collection_id)
+        if cursor is None and config.SYNC_INCREMENTAL:
+            cursor = await collection_dao.get_incremental_cursor(
+                collection_id, config.SYNC_FULL_INTERVAL_DAYS * 86400
+            )
+            if cursor is not None:
+                self.context.fav_time_cursors[collection_id] = cursor
+                self.context.request_save()
+        if cursor is not None:
+            while has_more and page <= max_pages:
+                _, has_more, oldest_fav_time = await self._fetch_collection_page(collection_id, title, page)
+                self.context.update_fetched_page(collection_id, page)
+                page += 1
+                if oldest_fav_time is not None and oldest_fav_time <= cursor:
+                    break
+            logger.info(f"收藏夹 {title} (ID: {collection_id}) 增量获取完成，共 {page - 1} 页")
+            return
         
         while has_more and page <= max_pages:
-            try:
-                # 检查是否已有缓存数据
-                cached_data = self.context.load_collection_page_data(collection_id, page)
-                if cached_data is not None:
-                    logger.debug(f"使用缓存数据: 收藏夹 {title} (ID: {collection_id}) 第 {page} 页")
-                    page += 1
-                    continue
-                
-                # 获取分页数据
-                from bilibili_api import favorite_list
-                
-                result = await favorite_list.get_video_favorite_list_content(
-                    media_id=int(collection_id), 
-                    page=page, 
-                    credential=bilibili_service.credential
-                )
-                
-                if not result.get("medias"):
-                    logger.info(f"收藏夹 {title} (ID: {collection_id}) 第 {page} 页无更多视频")
-                    break
-                
-                videos = result["medias"]
-                
-                # 保存分页数据到文件
-                self.context.save_collection_page_data(collection_id, page, videos)
-                
-                logger.info(f"收藏夹 {title} (ID: {collection_id}) 第 {page} 页获取到 {len(videos)} 个视频")
-                
-                has_more = result.get("has_more", False)
+            # 检查是否已有缓存数据
+            if await asyncio.to_thread(self.context.has_collection_page_data, collection_id, page):
+                logger.debug(f"使用缓存数据: 收藏夹 {title} (ID: {collection_id}) 第 {page} 页")
                 page += 1
-                
-                # 更新当前页数
-                self.context.current_page = page
-                self.context.save_lock_file()
-                
-                # 添加请求延迟
-                if has_more and page <= max_pages:
-                    delay = random.uniform(config.REQUEST_DELAY, config.REQUEST_DELAY * 2) / 1000
-                    await asyncio.sleep(delay)
-                    
-            except Exception as e:
-                logger.error(f"获取收藏夹 {title} (ID: {collection_id}) 第 {page} 页失败: {e}")
-                raise
+                continue
+            
+            page_size, has_more, _ = await self._fetch_collection_page(collection_id, title, page)
+            page += 1
+            
+            # 根据收藏数估算剩余页数，一批并发请求；收藏数过期时由最后一页的 has_more 兜底
+            if has_more and page <= max_pages and page_size:
+                last_page = min(max_pages, math.ceil(collection_data.get("media_count", 0) / page_size))
+                if last_page >= page:
+                    results = await asyncio.gather(*(fetch_page(p) for p in range(page, last_page + 1)))
+                    has_more = results[-1][1]
+                    page = last_page + 1
+            
+            # 记录本收藏夹已保存到的页数（按批次保存，减少锁文件写入）
+            self.context.update_fetched_page(collection_id, page - 1)
         
         if page > max_pages:
             logger.warning(f"收藏夹 {title} (ID: {collection_id}) 超过最大页数限制 {max_pages}，停止获取")
         
         logger.info(f"收藏夹 {title} (ID: {collection_id}) 数据获取完成，共 {page - 1} 页")
     
+    async def _fetch_collection_page(self, collection_id: str, title: str,
+                                     page: int) -> Tuple[int, bool, Optional[int]]:
+        """请求并保存收藏夹的一页数据，返回 (本页视频数, 是否还有更多, 本页最早的收藏时间)；已缓存的页直接读取"""
+        # 分页文件的读写和JSON编解码放到线程中执行，不阻塞事件循环
+        cached_data = await asyncio.to_thread(self.context.load_collection_page_data, collection_id, page)
+        if cached_data is not None:
+            logger.debug(f"使用缓存数据: 收藏夹 {title} (ID: {collection_id}) 第 {page} 页")
+            return len(cached_data), True, _oldest_fav_time(cached_data)
+        
+        # 所有请求共用同一个令牌桶，并发请求也不会超过限定频率；临时错误会退避重试，不必重新获取整个收藏夹
+        try:
+            result = await bilibili_service.call_api(
+                favorite_list.get_video_favorite_list_content,
+                media_id=int(collection_id), 
+                page=page, 
+                credential=bilibili_service.credential
+            )
+        except Exception as e:
+            logger.error(f"获取收藏夹 {title} (ID: {collection_id}) 第 {page} 页失败: {e}")
+            raise
+        
+        videos = result.get("medias")
+        if not videos:
+            logger.info(f"收藏夹 {title} (ID: {collection_id}) 第 {page} 页无更多视频")
+            return 0, False, None
+        
+        # 保存分页数据到文件
+        await asyncio.to_thread(self.context.save_collection_page_data, collection_id, page, videos)
+        
+        logger.info(f"收藏夹 {title} (ID: {collection_id}) 第 {page} 页获取到 {len(videos)} 个视频")
+        return len(videos), result.get("has_more", False), _oldest_fav_time(videos)
+    
     async def _process_all_data(self):
         """处理所有收藏夹的数据"""
         logger.info("开始处理所有收藏夹数据")
         
+        # 预先载入已有UP主，多个收藏夹中重复出现的UP主只写一次
+        self._uploader_cache = await get_uploader_map()
+        
         # 处理已获取数据的收藏夹
-        fetched_collections_copy = self.context.fetched_collections.copy()
+        fetched_collections_copy = list(self.context.fetched_collections.values())
         
         for collection_data in fetched_collections_copy:
             try:
@@ -366,6 +453,9 @@ class OptimizedSyncService:
         
         logger.info(f"处理收藏夹数据: {title} (ID: {collection_id})")
         
+        # 同一收藏夹的写入使用同一个同步时间
+        synced_at = datetime.now(timezone.utc)
+        
         # 创建或更新收藏夹记录
         user_mid = config.USER_DEDE_USER_ID
         db_collection_id = await get_or_create_collection(
@@ -373,70 +463,151 @@ class OptimizedSyncService:
             title=title,
             user_mid=user_mid,
             description=collection_data.get("intro", ""),
-            cover_url=collection_data.get("cover", "")
+            cover_url=collection_data.get("cover", ""),
+            now=synced_at
         )
         
-        # 获取收藏夹的所有视频数据
-        all_videos = self.context.get_collection_all_videos(collection_id)
-        
-        if not all_videos:
-            logger.info(f"收藏夹 {title} 中没有视频")
-            await collection_dao.update_sync_time(db_collection_id)
-            self.context.mark_collection_completed(collection_data)
-            return
-        
         # 获取数据库中现有的视频
         existing_videos = await video_dao.get_videos_by_collection(db_collection_id)
         existing_bvids = {video["bvid"] for video in existing_videos}
+        # 收藏时间未变的关系不必重新写入，只需批量刷新最后出现时间
+        existing_fav_times = {video["bvid"]: video["fav_time"] for video in existing_videos}
+        unchanged_ids: List[int] = []
         api_bvids = set()
+        video_count = 0
+        
+        # 逐页读取缓存的视频数据，按批处理；每批的文件读取和JSON解析在线程中完成，
+        # 并在写入当前批的同时预读下一批，内存中最多保留两批
+        batches = itertools.batched(self.context.iter_collection_all_videos(collection_id), PROCESS_BATCH_SIZE)
+        next_batch = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+        try:
+            while (batch := await next_batch) is not None:
+                next_batch = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+                video_count += len(batch)
+                await self._process_video_batch(batch, db_collection_id, synced_at, api_bvids,
+                                                existing_fav_times, unchanged_ids)
+        finally:
+            next_batch.cancel()
+        await video_dao.touch_collection_videos(db_collection_id, unchanged_ids, synced_at)
+        
+        # 增量获取的收藏夹只有新增部分，无法判断哪些视频被移除，由定期的完整同步检测
+        full_sync = collection_id not in self.context.fav_time_cursors
+        
+        if not video_count:
+            logger.info(f"收藏夹 {title} 中没有视频")
+            await collection_dao.update_sync_time(db_collection_id, full_sync=full_sync)
+            self.context.mark_collection_completed(collection_data)
+            return
         
-        # 处理每个视频
-        for video_data in all_videos:
+        # 标记已删除的视频
+        deleted_bvids = existing_bvids - api_bvids if full_sync else set()
+        if deleted_bvids:
             try:
-                await self._process_video_data(video_data, db_collection_id)
-                api_bvids.add(video_data["bv_id"])
+                await self._mark_videos_deleted(deleted_bvids, db_collection_id)
             except Exception as e:
-                error_msg = f"处理视频 {video_data.get('title', 'Unknown')} 失败: {e}"
+                error_msg = f"标记 {len(deleted_bvids)} 个视频为已删除失败: {e}"
                 error_traceback = traceback.format_exc()
                 logger.error(f"{error_msg}\n错误栈:\n{error_traceback}")
                 self.context.stats["errors"].append(error_msg)
         
-        # 标记已删除的视频
-        deleted_bvids = existing_bvids - api_bvids
-        for bvid in deleted_bvids:
+        # 更新收藏夹同步时间
+        await collection_dao.update_sync_time(db_collection_id, full_sync=full_sync)
+        self.context.mark_collection_completed(collection_data)
+        
+        logger.info(f"收藏夹 {title} 处理完成")
+    
+    async def _process_video_batch(self, videos: Sequence[Dict[str, Any]], db_collection_id: int,
+                                   synced_at: datetime, api_bvids: Set[str],
+                                   existing_fav_times: Dict[str, Optional[int]], unchanged_ids: List[int]):
+        """整理并批量写入一批视频，已处理的BVID加入 api_bvids
+        
+        收藏时间未变的已有关系不重复写入，其视频ID加入 unchanged_ids
+        """
+        uploaders = {}
+        new_videos = []
+        updated_videos = []
+        video_entries = []
+        
+        # 一次查出本批涉及的已入库视频（不限制收藏夹ID，因为视频表有全局唯一约束）
+        existing_map = await video_dao.get_videos_by_bvids(
+            [video_data["bv_id"] for video_data in videos if video_data.get("bv_id")]
+        )
+        
+        # 第一遍：逐个整理视频数据
+        for video_data in videos:
             try:
-                await self._mark_video_deleted(bvid, db_collection_id)
-                self.context.stats["videos_deleted"] += 1
+                bvid = video_data["bv_id"]
+                if bvid in api_bvids:
+                    continue
+                existing_video = existing_map.get(bvid)
+                processed_video_data = await self._prepare_video_data(video_data, existing_video, synced_at)
+                
+                uploader_data = video_data.get("upper", {})
+                mid = str(uploader_data.get("mid", ""))
+                uploaders[mid] = (
+                    mid, uploader_data.get("name", "Unknown"),
+                    uploader_data.get("face", ""), uploader_data.get("jump_link", "")
+                )
+                
+                if existing_video:
+                    # 只更新有变化的视频，稳定状态下的重复同步基本不产生视频表写入
+                    if any(
+                        processed_video_data[field] != existing_video.get(field)
+                        for field in video_dao.UPDATABLE_FIELDS if field in processed_video_data
+                    ):
+                        updated_videos.append((existing_video["id"], processed_video_data))
+                    video_entries.append((existing_video["id"], video_data))
+                else:
+                    new_videos.append(processed_video_data)
+                    video_entries.append((None, video_data))
+                api_bvids.add(bvid)
             except Exception as e:
-                error_msg = f"标记视频 {bvid} 为已删除失败: {e}"
+                error_msg = f"处理视频 {video_data.get('title', 'Unknown')} 失败: {e}"
                 error_traceback = traceback.format_exc()
                 logger.error(f"{error_msg}\n错误栈:\n{error_traceback}")
                 self.context.stats["errors"].append(error_msg)
         
-        # 更新收藏夹同步时间
-        await collection_dao.update_sync_time(db_collection_id)
-        self.context.mark_collection_completed(collection_data)
+        # 第二遍：UP主、视频、收藏关系和统计信息各自批量写入
+        changed_uploaders = [
+            uploader for mid, uploader in uploaders.items()
+            if self._uploader_cache.get(mid) != uploader
+        ]
+        await bulk_upsert_uploaders(changed_uploaders, synced_at)
+        self._uploader_cache.update((uploader[0], uploader) for uploader in changed_uploaders)
+        created_ids = await video_dao.bulk_save_videos(new_videos, updated_videos, synced_at)
+        self.context.stats["videos_added"] += len(new_videos)
+        self.context.stats["videos_updated"] += len(updated_videos)
+        
+        collection_items = []
+        stats_items = []
+        for video_id, video_data in video_entries:
+            if video_id is None:
+                video_id = created_ids[video_data["bv_id"]]
+            bvid = video_data["bv_id"]
+            fav_time = video_data.get("fav_time")
+            if bvid in existing_fav_times and existing_fav_times[bvid] == fav_time:
+                unchanged_ids.append(video_id)
+            else:
+                collection_items.append((video_id, fav_time))
+            if video_data.get("cnt_info"):
+                stats_items.append((video_id, video_data["cnt_info"]))
         
-        logger.info(f"收藏夹 {title} 处理完成")
+        # 批量更新收藏关系和统计信息
+        await video_dao.bulk_upsert_collection_videos(db_collection_id, collection_items, synced_at)
+        await video_dao.bulk_insert_video_stats(stats_items, synced_at)
     
-    async def _process_video_data(self, video_data: Dict[str, Any], collection_id: int):
-        """处理单个视频数据"""
+    async def _prepare_video_data(self, video_data: Dict[str, Any], existing_video: Optional[Dict[str, Any]],
+                                  now: Optional[datetime] = None) -> Dict[str, Any]:
+        """根据接口数据和已有记录整理待写入的视频字段（写入由调用方批量完成）"""
         bvid = video_data["bv_id"]
         title = video_data["title"]
+        now = now or datetime.now(timezone.utc)
         
         # 检查视频是否已失效 - 增强判断逻辑
         is_deleted = self._is_video_deleted(video_data)
         
-        # 创建或获取UP主
+        # 准备视频数据（字段固定，直接写成字典字面量，比按字段表循环或 itemgetter 取值更快）
         uploader_data = video_data.get("upper", {})
-        uploader_id = await get_or_create_uploader(
-            mid=str(uploader_data.get("mid", "")),
-            name=uploader_data.get("name", "Unknown"),
-            face_url=uploader_data.get("face", ""),
-            jump_link=uploader_data.get("jump_link", "")
-        )
-        
-        # 准备视频数据
         ugc_data = video_data.get("ugc") or {}
         processed_video_data = {
             "bilibili_id": str(video_data["id"]),
@@ -451,27 +622,21 @@ class OptimizedSyncService:
             "attr": video_data.get("attr", 0),
             "ctime": video_data.get("ctime"),
             "pubtime": video_data.get("pubtime"),
-            "first_cid": str(ugc_data.get("first_cid")) if ugc_data.get("first_cid") else None,
-            "season_info": json.dumps(video_data.get("season"), ensure_ascii=False) if video_data.get("season") else None,
-            "ogv_info": json.dumps(video_data.get("ogv"), ensure_ascii=False) if video_data.get("ogv") else None,
+            "first_cid": str(first_cid) if (first_cid := ugc_data.get("first_cid")) else None,
+            "season_info": _json_encode(season) if (season := video_data.get("season")) else None,
+            "ogv_info": _json_encode(ogv) if (ogv := video_data.get("ogv")) else None,
             "link": video_data.get("link"),
             "media_list_link": video_data.get("media_list_link")
         }
         
-        # 检查视频是否已存在（不限制收藏夹ID，因为视频表有全局唯一约束）
-        existing_video = await video_dao.get_video_by_bvid(bvid)
-        
         if existing_video:
-            # 更新现有视频信息
-            video_id = existing_video["id"]
-            
             # 检查视频状态变化
             current_deleted = existing_video.get("is_deleted", False)
             
             if not current_deleted and is_deleted:
                 # 视频变为不可用
                 processed_video_data["is_deleted"] = True
-                processed_video_data["deleted_at"] = datetime.now(timezone.utc)
+                processed_video_data["deleted_at"] = now
                 if "已失效视频" not in existing_video["title"]:
                     processed_video_data["title"] = f"{existing_video['title']} (已失效视频)"
                 logger.info(f"视频 '{existing_video['title']}' (BVID: {bvid}) 变为不可用")
@@ -497,47 +662,16 @@ class OptimizedSyncService:
                 processed_video_data["is_deleted"] = is_deleted
                 if is_deleted:
                     processed_video_data["deleted_at"] = existing_video.get("deleted_at")
-
-            await video_dao.update_video(video_id, processed_video_data)
-            self.context.stats["videos_updated"] += 1
         else:
-            # 创建新视频记录
+            # 新视频
             processed_video_data["intro"] = video_data.get("intro", "")
             processed_video_data["is_deleted"] = is_deleted
             if is_deleted:
-                processed_video_data["deleted_at"] = datetime.now(timezone.utc)
-            
-            try:
-                video_id = await video_dao.create_video(processed_video_data)
-                if is_deleted:
-                    logger.info(f"新视频 '{title}' (BVID: {bvid}) 为不可用状态")
-                self.context.stats["videos_added"] += 1
-            except Exception as e:
-                if "UNIQUE constraint failed" in str(e):
-                    # 并发情况下可能出现重复插入，重新查询
-                    logger.warning(f"视频 {bvid} 插入时发生唯一约束冲突，重新查询")
-                    existing_video = await video_dao.get_video_by_bvid(bvid)
-                    if existing_video:
-                        video_id = existing_video["id"]
-                        await video_dao.update_video(video_id, processed_video_data)
-                        self.context.stats["videos_updated"] += 1
-                    else:
-                        raise
-                else:
-                    raise
-        
-        # 更新收藏关系
-        await video_dao.add_to_collection(
-            collection_id=collection_id,
-            video_id=video_id,
-            fav_time=video_data.get("fav_time")
-        )
-        
-        # 添加统计信息
-        if video_data.get("cnt_info"):
-            await video_dao.add_video_stats(video_id, video_data["cnt_info"])
+                processed_video_data["deleted_at"] = now
+                logger.info(f"新视频 '{title}' (BVID: {bvid}) 为不可用状态")
         
         # 注意：封面下载将在独立的下载阶段进行
+        return processed_video_data
     
     def _is_video_deleted(self, video_data: Dict[str, Any]) -> bool:
         """
@@ -547,16 +681,7 @@ class OptimizedSyncService:
         title = video_data.get("title", "")
         
         # 1. 标题检查 - 失效视频的标题特征
-        deleted_titles = [
-            "已失效视频",
-            "视频已失效", 
-            "内容已失效",
-            "该视频已失效",
-            "视频不存在",
-            "视频已被删除"
-        ]
-        
-        title_indicates_deleted = any(deleted_title in title for deleted_title in deleted_titles)
+        title_indicates_deleted = any(deleted_title in title for deleted_title in _DELETED_TITLE_MARKERS)
         
         # 失效视频主要通过title判断
         return title_indicates_deleted
@@ -574,76 +699,66 @@ class OptimizedSyncService:
             return False
             
         # 2. 标题必须是有意义的，不能是失效标识
-        if not title or title in ["已失效视频", "视频已失效", "内容已失效"]:
+        if not title or title in _DELETED_TITLES:
             return False
             
         logger.info(f"视频 {bvid} 通过恢复验证，可以恢复")
         return True
     
-    async def _download_cover_if_needed(self, bvid: str, cover_url: str, video_id: int):
-        """根据需要下载封面"""
+    async def _download_cover_if_needed(self, bvid: str, cover_url: str, video_id: int,
+                                        video: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """根据需要下载封面，返回新下载的本地路径（由调用方写入数据库）；已查询过视频记录时可直接传入 video 避免重复查询"""
         try:
             # 检查是否需要下载封面
-            video = await video_dao.get_video_by_id(video_id)
+            if video is None:
+                video = await video_dao.get_video_by_id(video_id)
             if video and video.get("local_cover_path"):
                 # 已有本地封面，跳过
-                return
+                return None
             
             # 下载封面
-            local_path = await cover_downloader.download_cover(bvid, cover_url)
-            if local_path:
-                # 更新视频记录中的本地封面路径
-                await video_dao.update_video(video_id, {"local_cover_path": local_path})
-                self.context.stats["covers_downloaded"] += 1
+            return await cover_downloader.download_cover(bvid, cover_url)
                 
         except Exception as e:
             error_traceback = traceback.format_exc()
             logger.error(f"下载封面失败: BVID {bvid}, 错误: {e}\n错误栈:\n{error_traceback}")
+            return None
     
-    async def _mark_video_deleted(self, bvid: str, collection_id: int):
-        """标记视频为已删除"""
-        video = await video_dao.get_video_by_bvid(bvid)
-        if not video:
+    async def _mark_videos_deleted(self, bvids: Set[str], collection_id: int):
+        """批量标记视频为已删除，每批视频的写入在同一事务中完成"""
+        # 一次联表查询取出视频及UP主名称
+        videos_by_bvid = await video_dao.get_videos_by_bvids(list(bvids))
+        for bvid in bvids - videos_by_bvid.keys():
             logger.warning(f"未找到要删除的视频: {bvid}")
+        videos = list(videos_by_bvid.values())
+        if not videos:
             return
-            
+        
         # 获取收藏夹信息用于记录
         collection = await collection_dao.get_collection_by_id(collection_id)
         collection_title = collection["title"] if collection else f"收藏夹ID:{collection_id}"
         
-        # 记录被删除的视频信息
-        deleted_video_info = {
-            "bvid": bvid,
-            "title": video["title"],
-            "uploader_name": video.get("uploader_name", "Unknown"),
-            "collection_title": collection_title,
-            "deleted_at": datetime.now(timezone.utc).isoformat()
-        }
-        self.context.stats["deleted_videos"].append(deleted_video_info)
-        
-        # 标记视频为已删除
-        await video_dao.mark_as_deleted(video["id"])
+        await video_dao.bulk_remove_deleted_from_collection(collection_id, videos, reason="从B站收藏夹中移除")
         
-        # 从收藏夹中移除视频
-        await video_dao.remove_from_collection(collection_id, video["id"])
-        
-        # 记录删除日志
-        await log_deletion(
-            collection_id=collection_id,
-            video_bvid=bvid,
-            video_title=video["title"],
-            uploader_name=video.get("uploader_name", "Unknown"),
-            reason="从B站收藏夹中移除"
-        )
-        
-        logger.info(f"视频 '{video['title']}' (BVID: {bvid}) 已从收藏夹 '{collection_title}' 中删除")
+        # 记录被删除的视频信息
+        deleted_at = datetime.now(timezone.utc).isoformat()
+        for video in videos:
+            self.context.stats["deleted_videos"].append({
+                "bvid": video["bvid"],
+                "title": video["title"],
+                "uploader_name": video.get("uploader_name") or "Unknown",
+                "collection_title": collection_title,
+                "deleted_at": deleted_at
+            })
+            logger.info(f"视频 '{video['title']}' (BVID: {video['bvid']}) 已从收藏夹 '{collection_title}' 中删除")
+        self.context.stats["videos_deleted"] += len(videos)
 
     async def _download_all_covers(self):
         """下载所有收藏夹视频的封面"""
         logger.info("开始下载所有收藏夹视频的封面")
         
         # 处理已处理完成的收藏夹
-        processed_collections_copy = self.context.processed_collections.copy()
+        processed_collections_copy = list(self.context.processed_collections.values())
         
         for collection_data in processed_collections_copy:
             try:
@@ -667,35 +782,48 @@ class OptimizedSyncService:
         logger.info(f"下载收藏夹封面: {title} (ID: {collection_id})")
         
         # 获取收藏夹的所有视频数据
-        all_videos = self.context.get_collection_all_videos(collection_id)
+        all_videos = await asyncio.to_thread(self.context.get_collection_all_videos, collection_id)
         
         if not all_videos:
             logger.info(f"收藏夹 {title} 中没有视频需要下载封面")
             return
         
-        # 处理每个视频的封面下载
-        for video_data in all_videos:
+        # 一次性查出本收藏夹已入库的视频，避免逐个按BVID查询
+        existing_videos = await video_dao.get_videos_by_bvids(
+            [video_data["bv_id"] for video_data in all_videos if video_data.get("bv_id")]
+        )
+        
+        semaphore = asyncio.Semaphore(max(1, config.COVER_DOWNLOAD_CONCURRENCY))
+        cover_paths = []
+        
+        async def download_cover(video_data: Dict[str, Any]):
             try:
                 bvid = video_data["bv_id"]
-                title = video_data["title"]
                 cover_url = video_data.get("cover", "")
                 
-                # 检查视频是否已失效
-                is_deleted = self._is_video_deleted(video_data)
-                
                 # 只为有效视频下载封面
-                if not is_deleted and cover_url:
-                    # 获取视频ID
-                    video = await video_dao.get_video_by_bvid(bvid)
-                    if video:
-                        await self._download_cover_if_needed(bvid, cover_url, video["id"])
-                        
+                if self._is_video_deleted(video_data) or not cover_url:
+                    return
+                video = existing_videos.get(bvid)
+                if not video or video.get("local_cover_path"):
+                    return
+                
+                async with semaphore:
+                    local_path = await self._download_cover_if_needed(bvid, cover_url, video["id"], video)
+                if local_path:
+                    cover_paths.append((video["id"], local_path))
+                    
             except Exception as e:
                 error_msg = f"下载视频 {video_data.get('title', 'Unknown')} 封面失败: {e}"
                 error_traceback = traceback.format_exc()
                 logger.error(f"{error_msg}\n错误栈:\n{error_traceback}")
                 self.context.stats["errors"].append(error_msg)
         
+        # 封面下载是纯网络IO，有限并发地下载，完成后一次写入本地路径
+        await asyncio.gather(*(download_cover(video_data) for video_data in all_videos))
+        await video_dao.bulk_update_local_cover_paths(cover_paths)
+        self.context.stats["covers_downloaded"] += len(cover_paths)
+        
         logger.info(f"收藏夹 {title} 封面下载完成")
 
 
@@ -2,15 +2,38 @@
 同步上下文管理器
 管理同步任务的状态、锁文件和数据缓存
 """
+import asyncio
 import json
 import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Any, List, Optional, Set, TypedDict
+from typing import Dict, Any, Iterator, List, Optional, Set, TypedDict
 from pathlib import Path
 from ..core.config import config
 from ..utils.logger import logger
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 锁文件延迟保存的时间（秒），期间的多次进度变化合并为一次写入
+LOCK_FILE_SAVE_DELAY = 1.0
+
+# 复用编码器，一次编码成完整字符串后单次写入；json.dump 会按片段多次写文件
+_encode_compact = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+# 内存中缓存全部分页数据的收藏夹数量上限
+PAGES_CACHE_SIZE = 4
+
+# 读取收藏夹全部分页时的线程数
+PAGE_LOAD_WORKERS = min(8, os.cpu_count() or 1)
+
 # {'id': 62132569, 'fid': 621325, 'mid': 142769, 'attr': 0, 'title': '默认收藏夹', 'fav_state': 0, 'media_count': 835}
 class ProcessCollection(TypedDict):
     id: str
@@ -21,9 +44,24 @@ class ProcessCollection(TypedDict):
     fav_state: int
     media_count: int
 
+def collections_by_id(collections: List[ProcessCollection]) -> Dict[str, ProcessCollection]:
+    """将收藏夹列表转换为以字符串ID为键的字典，保持原有顺序"""
+    return {str(collection.get('id')): collection for collection in collections}
+
+
 class SyncContext:
     """同步上下文管理器"""
     
+    # 属性固定，使用 __slots__ 省去实例字典
+    __slots__ = (
+        "task_id", "lock_file_path", "data_dir", "status",
+        "collections_to_process", "fetched_collections", "fetched_pages",
+        "processed_collections", "downloaded_collections", "failed_collections", "fav_time_cursors",
+        "stats", "created_at", "updated_at",
+        "_save_pending", "_save_task", "_writer", "_lock_fd", "_last_saved_data",
+        "_pages_cache", "_pages_cache_lock",
+    )
+    
     def __init__(self, task_id: str = None):
         self.task_id = task_id or str(uuid.uuid4())
         self.lock_file_path = Path(config.DATA_DIR) / "sync_lock.json"
@@ -31,13 +69,16 @@ class SyncContext:
         
         # 同步状态
         self.status = "initializing"  # initializing, fetching, processing, downloading, completed, failed
-        self.collections_to_process: List[ProcessCollection] = []
-        self.fetched_collections: List[ProcessCollection] = []     # 已获取数据，待处理入库
-        self.current_collection: Optional[ProcessCollection] = None
-        self.current_page = 1
-        self.processed_collections: List[ProcessCollection] = []   # 已处理入库，待下载封面
-        self.downloaded_collections: List[ProcessCollection] = []
+        # 各阶段的收藏夹以字符串ID为键，状态转移时按键移动，锁文件中仍保存为列表
+        self.collections_to_process: Dict[str, ProcessCollection] = {}
+        self.fetched_collections: Dict[str, ProcessCollection] = {}     # 已获取数据，待处理入库
+        # 正在获取的收藏夹已连续保存到的页码 {收藏夹ID: 页码}，多个收藏夹并发获取，各自记录，恢复时从下一页继续
+        self.fetched_pages: Dict[str, int] = {}
+        self.processed_collections: Dict[str, ProcessCollection] = {}   # 已处理入库，待下载封面
+        self.downloaded_collections: Dict[str, ProcessCollection] = {}
         self.failed_collections: List[Dict[str, Any]] = []
+        # 增量同步的收藏夹: {收藏夹ID: 获取前库中最新的收藏时间}，只获取了比它更新的分页
+        self.fav_time_cursors: Dict[str, int] = {}
         
         # 统计信息
         self.stats = {
@@ -54,35 +95,124 @@ class SyncContext:
         self.created_at = datetime.now(timezone.utc).isoformat()
         self.updated_at = self.created_at
         
+        # 延迟保存锁文件的状态
+        self._save_pending = False
+        self._save_task: Optional[asyncio.Task] = None
+        # 锁文件专用写线程，单线程保证写入顺序，首次保存时创建
+        self._writer: Optional[ThreadPoolExecutor] = None
+        # 同步进程锁的文件描述符，持有期间其他同步无法开始
+        self._lock_fd: Optional[int] = None
+        # 上次写入锁文件的内容（不含更新时间），只在写线程中访问
+        self._last_saved_data: Optional[Dict[str, Any]] = None
+        
+        # 最近读取过的收藏夹全部分页，写入分页时失效；分页读写可能在工作线程中进行，访问需加锁
+        self._pages_cache: "OrderedDict[str, List[List[Dict[str, Any]]]]" = OrderedDict()
+        self._pages_cache_lock = threading.Lock()
+        
+    def request_save(self):
+        """请求保存锁文件：在事件循环中延迟合并写入，没有运行中的事件循环时立即保存"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save_lock_file()
+            return
+        self._save_pending = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._delayed_save())
+    
+    async def _delayed_save(self):
+        """等待一段时间后保存尚未写入的进度"""
+        await asyncio.sleep(LOCK_FILE_SAVE_DELAY)
+        if self._save_pending:
+            self.save_lock_file()
+    
+    def flush(self):
+        """立即写入尚未保存的进度"""
+        if self._save_pending:
+            self.save_lock_file()
+        
     def save_lock_file(self):
-        """保存锁文件"""
+        """保存锁文件：在当前线程复制状态，序列化和写入交给专用写线程按顺序完成"""
+        self._save_pending = False
+        if self._writer is None:
+            # 非守护线程，进程退出前会写完已提交的快照
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-lock-writer")
+        self._writer.submit(self._write_lock_data, self._snapshot())
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        """复制锁文件需要的状态，之后对列表的修改不影响已提交的写入"""
+        stats = dict(self.stats)
+        stats["errors"] = list(stats["errors"])
+        stats["deleted_videos"] = list(stats["deleted_videos"])
+        return {
+            "task_id": self.task_id,
+            "status": self.status,
+            "collections_to_process": list(self.collections_to_process.values()),
+            "fetched_collections": list(self.fetched_collections.values()),
+            "fetched_pages": dict(self.fetched_pages),
+            "processed_collections": list(self.processed_collections.values()),
+            "downloaded_collections": list(self.downloaded_collections.values()),
+            "failed_collections": list(self.failed_collections),
+            "fav_time_cursors": dict(self.fav_time_cursors),
+            "stats": stats,
+            "created_at": self.created_at,
+            # 只记录时间戳，确实需要写入时才在写线程中格式化
+            "updated_at": time.time()
+        }
+    
+    def _write_lock_data(self, lock_data: Dict[str, Any]):
+        """在写线程中序列化并写入锁文件，除更新时间外与上次写入相同时跳过"""
+        updated_at = lock_data.pop("updated_at")
+        if lock_data == self._last_saved_data:
+            logger.debug("锁文件内容未变化，跳过写入")
+            return
         try:
             # 确保目录存在
             self.lock_file_path.parent.mkdir(parents=True, exist_ok=True)
             
-            lock_data = {
-                "task_id": self.task_id,
-                "status": self.status,
-                "collections_to_process": self.collections_to_process,
-                "fetched_collections": self.fetched_collections,
-                "current_collection": self.current_collection,
-                "current_page": self.current_page,
-                "processed_collections": self.processed_collections,
-                "downloaded_collections": self.downloaded_collections,
-                "failed_collections": self.failed_collections,
-                "stats": self.stats,
-                "created_at": self.created_at,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            with open(self.lock_file_path, 'w', encoding='utf-8') as f:
-                json.dump(lock_data, f, ensure_ascii=False, indent=2)
+            # 锁文件只供程序读取，紧凑格式输出，不做缩进；
+            # 先完整写入临时文件并落盘，再原子替换，中途崩溃也不会留下截断的锁文件
+            tmp_path = self.lock_file_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                updated_at = datetime.fromtimestamp(updated_at, timezone.utc).isoformat()
+                f.write(_encode_compact({**lock_data, "updated_at": updated_at}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.lock_file_path)
+            self._last_saved_data = lock_data
                 
             logger.debug(f"锁文件已保存: {self.lock_file_path}")
             
         except Exception as e:
             logger.error(f"保存锁文件失败: {e}")
-            raise
+    
+    def acquire_lock(self):
+        """获取同步进程锁，已有同步任务在运行时抛出 RuntimeError
+        
+        锁文件会被原子替换，因此加锁对象是旁边单独的 .lock 文件；
+        flock 按打开的文件加锁，同一进程内的两次同步也会互斥，进程退出时系统自动释放
+        """
+        if self._lock_fd is not None:
+            return
+        path = self.lock_file_path.with_name(self.lock_file_path.name + ".lock")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            raise RuntimeError("已有同步任务正在运行")
+        self._lock_fd = fd
+    
+    def release_lock(self):
+        """释放同步进程锁，关闭文件即释放"""
+        if self._lock_fd is None:
+            return
+        os.close(self._lock_fd)
+        self._lock_fd = None
     
     @classmethod
     def load_from_lock_file(cls, lock_file_path: str) -> 'SyncContext':
@@ -93,13 +223,18 @@ class SyncContext:
             
             context = cls(task_id=lock_data["task_id"])
             context.status = lock_data["status"]
-            context.collections_to_process = lock_data["collections_to_process"]
-            context.fetched_collections = lock_data["fetched_collections"]
-            context.current_collection = lock_data["current_collection"]
-            context.current_page = lock_data["current_page"]
-            context.processed_collections = lock_data["processed_collections"]
-            context.downloaded_collections = lock_data["downloaded_collections"]
+            context.collections_to_process = collections_by_id(lock_data["collections_to_process"])
+            context.fetched_collections = collections_by_id(lock_data["fetched_collections"])
+            context.fetched_pages = lock_data.get("fetched_pages", {})
+            # 旧版本的锁文件只记录一个当前收藏夹和下一页页码
+            if current := lock_data.get("current_collection"):
+                current_id = str(current.get('id'))
+                context.collections_to_process.setdefault(current_id, current)
+                context.fetched_pages.setdefault(current_id, lock_data.get("current_page", 1) - 1)
+            context.processed_collections = collections_by_id(lock_data["processed_collections"])
+            context.downloaded_collections = collections_by_id(lock_data["downloaded_collections"])
             context.failed_collections = lock_data["failed_collections"]
+            context.fav_time_cursors = lock_data.get("fav_time_cursors", {})
             context.stats = lock_data["stats"]
             context.created_at = lock_data["created_at"]
             context.updated_at = lock_data["updated_at"]
@@ -131,10 +266,12 @@ class SyncContext:
             collection_dir = self.data_dir / collection_id
             collection_dir.mkdir(parents=True, exist_ok=True)
             
-            # 保存分页数据
+            # 保存分页数据，每行一个视频（NDJSON），JSON编码不会输出换行，可以按行切分
             page_file = collection_dir / f"page_{page}.json"
             with open(page_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.write("".join(_encode_compact(video) + "\n" for video in data))
+            with self._pages_cache_lock:
+                self._pages_cache.pop(collection_id, None)
             
             logger.debug(f"保存收藏夹 {collection_id} 第 {page} 页数据: {len(data)} 个视频")
             
@@ -142,55 +279,88 @@ class SyncContext:
             logger.error(f"保存分页数据失败: {e}")
             raise
     
+    def has_collection_page_data(self, collection_id: str, page: int) -> bool:
+        """检查分页数据是否已保存，不读取文件内容"""
+        return (self.data_dir / collection_id / f"page_{page}.json").exists()
+    
     def load_collection_page_data(self, collection_id: str, page: int) -> Optional[List[Dict[str, Any]]]:
         """加载收藏夹分页数据"""
+        page_file = self.data_dir / collection_id / f"page_{page}.json"
+        if not page_file.exists():
+            return None
+        return self._load_page_file(page_file)
+    
+    def _load_page_file(self, page_file: Path) -> Optional[List[Dict[str, Any]]]:
+        """读取一个分页文件，失败时返回 None"""
         try:
-            page_file = self.data_dir / collection_id / f"page_{page}.json"
-            if not page_file.exists():
-                return None
-            
-            with open(page_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # 一次读出字节交给 json.loads 解码，省去文本流的逐块解码和拼接
+            raw = page_file.read_bytes()
+            if raw.lstrip()[:1] == b"[":
+                # 旧版本保存的整页JSON数组
+                data = json.loads(raw)
+            else:
+                data = [json.loads(line) for line in raw.splitlines() if line]
             
-            logger.debug(f"加载收藏夹 {collection_id} 第 {page} 页数据: {len(data)} 个视频")
+            logger.debug(f"加载分页数据 {page_file}: {len(data)} 个视频")
             return data
             
         except Exception as e:
             logger.error(f"加载分页数据失败: {e}")
             return None
     
+    def _list_page_files(self, collection_id: str) -> List[Path]:
+        """一次列出收藏夹目录下的分页文件，按页码排序"""
+        try:
+            entries = list(os.scandir(self.data_dir / collection_id))
+        except FileNotFoundError:
+            return []
+        pages = []
+        for entry in entries:
+            name = entry.name
+            if name.startswith("page_") and name.endswith(".json") and name[5:-5].isdigit():
+                pages.append((int(name[5:-5]), Path(entry.path)))
+        pages.sort()
+        return [path for _, path in pages]
+    
     def get_collection_all_pages(self, collection_id: str) -> List[List[Dict[str, Any]]]:
-        """获取收藏夹的所有分页数据"""
+        """获取收藏夹的所有分页数据，最近读取过的收藏夹直接返回缓存（调用方不应修改返回的数据）"""
+        with self._pages_cache_lock:
+            cached = self._pages_cache.get(collection_id)
+            if cached is not None:
+                self._pages_cache.move_to_end(collection_id)
+                return cached
         try:
-            collection_dir = self.data_dir / collection_id
-            if not collection_dir.exists():
-                return []
-            
-            all_pages = []
-            page = 1
-            
-            while True:
-                page_data = self.load_collection_page_data(collection_id, page)
-                if page_data is None:
-                    break
-                all_pages.append(page_data)
-                page += 1
+            # 一次列出目录代替逐页探测文件是否存在，页码不连续时也不会漏掉后面的分页
+            page_files = self._list_page_files(collection_id)
+            if len(page_files) > 1:
+                # 多页时用线程池读取，文件读取期间会释放GIL，各页的磁盘等待可以重叠
+                with ThreadPoolExecutor(max_workers=min(PAGE_LOAD_WORKERS, len(page_files))) as executor:
+                    loaded = list(executor.map(self._load_page_file, page_files))
+            else:
+                loaded = [self._load_page_file(page_file) for page_file in page_files]
+            all_pages = [page_data for page_data in loaded if page_data is not None]
             
             logger.debug(f"收藏夹 {collection_id} 共有 {len(all_pages)} 页数据")
+            with self._pages_cache_lock:
+                self._pages_cache[collection_id] = all_pages
+                while len(self._pages_cache) > PAGES_CACHE_SIZE:
+                    self._pages_cache.popitem(last=False)
             return all_pages
             
         except Exception as e:
             logger.error(f"获取收藏夹所有分页数据失败: {e}")
             return []
     
+    def iter_collection_all_videos(self, collection_id: str) -> Iterator[Dict[str, Any]]:
+        """逐页读取收藏夹的视频数据，同一时刻只加载一页"""
+        for page_file in self._list_page_files(collection_id):
+            page_data = self._load_page_file(page_file)
+            if page_data is not None:
+                yield from page_data
+    
     def get_collection_all_videos(self, collection_id: str) -> List[Dict[str, Any]]:
         """获取收藏夹的所有视频数据"""
-        all_pages = self.get_collection_all_pages(collection_id)
-        all_videos = []
-        
-        for page_data in all_pages:
-            all_videos.extend(page_data)
-        
+        all_videos = [video for page_data in self.get_collection_all_pages(collection_id) for video in page_data]
         logger.debug(f"收藏夹 {collection_id} 共有 {len(all_videos)} 个视频")
         return all_videos
     
@@ -201,64 +371,38 @@ class SyncContext:
         self.save_lock_file()
         logger.info(f"同步状态更新为: {status}")
     
-    def set_current_collection(self, collection: Dict[str, Any], page: int = 1):
-        """设置当前处理的收藏夹"""
-        self.current_collection = collection
-        self.current_page = page
-        self.save_lock_file()
-        logger.info(f"开始处理收藏夹: {collection.get('title', 'Unknown')} (ID: {collection.get('id')})")
+    def update_fetched_page(self, collection_id: str, page: int):
+        """记录收藏夹第1页到 page 页都已保存（按批次延迟保存，减少锁文件写入）"""
+        self.fetched_pages[str(collection_id)] = page
+        self.request_save()
     
     def mark_collection_data_fetched(self, collection_id: str):
         """标记收藏夹数据拉取完成（移动到已获取列表）"""
-        # 找到对应的收藏夹
-        collection_to_move = None
-        for collection in self.collections_to_process:
-            if str(collection.get('id')) == str(collection_id):
-                collection_to_move = collection
-                break
+        collection_id = str(collection_id)
         
         # 如果在collections_to_process中找到，则移动到fetched_collections
+        collection_to_move = self.collections_to_process.pop(collection_id, None)
         if collection_to_move:
-            self.collections_to_process = [
-                c for c in self.collections_to_process 
-                if str(c.get('id')) != str(collection_id)
-            ]
-            self.fetched_collections.append(collection_to_move)
+            self.fetched_collections[collection_id] = collection_to_move
         
-        # 清除当前收藏夹状态，准备进入处理阶段
-        if self.current_collection and str(self.current_collection.get('id')) == str(collection_id):
-            self.current_collection = None
-            self.current_page = 1
+        # 清除获取进度，准备进入处理阶段
+        self.fetched_pages.pop(collection_id, None)
         
-        self.save_lock_file()
+        self.request_save()
         logger.info(f"收藏夹 {collection_id} 数据拉取完成，移动到已获取列表")
     
     def mark_collection_completed(self, collection: Dict[str, Any]):
         """标记收藏夹处理完成（移动到已处理列表）"""
         collection_id = str(collection.get('id'))
         
-        # 检查是否已在processed_collections中
-        is_processed = any(
-            str(processed_collection.get('id')) == collection_id 
-            for processed_collection in self.processed_collections
-        )
-        
-        if not is_processed:
-            self.processed_collections.append(collection)
+        # 已在processed_collections中时保留原有记录
+        self.processed_collections.setdefault(collection_id, collection)
         
         # 从fetched_collections中移除
-        self.fetched_collections = [
-            c for c in self.fetched_collections 
-            if str(c.get('id')) != collection_id
-        ]
-        
-        # 清除当前收藏夹状态
-        if self.current_collection and str(self.current_collection.get('id')) == str(collection_id):
-            self.current_collection = None
-            self.current_page = 1
+        self.fetched_collections.pop(collection_id, None)
         
         self.stats["collections_processed"] += 1
-        self.save_lock_file()
+        self.request_save()
         
         logger.info(f"收藏夹 {collection.get('title', 'Unknown')} (ID: {collection_id}) 处理完成，移动到已处理列表")
     
@@ -266,27 +410,13 @@ class SyncContext:
         """标记收藏夹下载完成（移动到已下载列表）"""
         collection_id = str(collection.get('id'))
         
-        # 检查是否已在downloaded_collections中
-        is_downloaded = any(
-            str(downloaded_collection.get('id')) == collection_id 
-            for downloaded_collection in self.downloaded_collections
-        )
-        
-        if not is_downloaded:
-            self.downloaded_collections.append(collection)
+        # 已在downloaded_collections中时保留原有记录
+        self.downloaded_collections.setdefault(collection_id, collection)
         
         # 从processed_collections中移除
-        self.processed_collections = [
-            c for c in self.processed_collections 
-            if str(c.get('id')) != collection_id
-        ]
-        
-        # 清除当前收藏夹状态
-        if self.current_collection and str(self.current_collection.get('id')) == str(collection_id):
-            self.current_collection = None
-            self.current_page = 1
+        self.processed_collections.pop(collection_id, None)
         
-        self.save_lock_file()
+        self.request_save()
         logger.info(f"收藏夹 {collection.get('title', 'Unknown')} (ID: {collection_id}) 下载完成，移动到已下载列表")
     
     def mark_collection_failed(self, collection: Dict[str, Any], error: str):
@@ -302,36 +432,35 @@ class SyncContext:
         self.stats["errors"].append(f"收藏夹 {collection.get('title', 'Unknown')}: {error}")
         
         # 从所有相关列表中移除
-        self.collections_to_process = [
-            c for c in self.collections_to_process 
-            if str(c.get('id')) != collection_id
-        ]
+        self.collections_to_process.pop(collection_id, None)
+        self.fetched_collections.pop(collection_id, None)
+        self.processed_collections.pop(collection_id, None)
+        self.downloaded_collections.pop(collection_id, None)
+        self.fetched_pages.pop(collection_id, None)
         
-        self.fetched_collections = [
-            c for c in self.fetched_collections 
-            if str(c.get('id')) != collection_id
-        ]
-        
-        self.processed_collections = [
-            c for c in self.processed_collections 
-            if str(c.get('id')) != collection_id
-        ]
-        
-        self.downloaded_collections = [
-            c for c in self.downloaded_collections 
-            if str(c.get('id')) != collection_id
-        ]
-        
-        # 清除当前收藏夹状态
-        if self.current_collection and str(self.current_collection.get('id')) == str(collection_id):
-            self.current_collection = None
-            self.current_page = 1
-        
-        self.save_lock_file()
+        self.request_save()
         logger.error(f"收藏夹 {collection.get('title', 'Unknown')} 处理失败: {error}")
     
+    def close(self):
+        """写入尚未保存的进度，等待写线程完成后关闭它（同步结束时调用，无论成功与否）"""
+        self.flush()
+        self._shutdown_writer()
+    
+    def _shutdown_writer(self):
+        """取消尚未执行的延迟保存，等待已提交的写入完成并关闭写线程"""
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+        self._save_task = None
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+    
     def cleanup(self):
         """清理锁文件（保留数据目录作为历史记录）"""
+        # 丢弃尚未执行的延迟保存并等待已提交的写入完成，避免删除后又重新写出锁文件
+        self._save_pending = False
+        self._shutdown_writer()
+        self._last_saved_data = None
         try:
             # 删除锁文件
             if self.lock_file_path.exists():
@@ -343,13 +472,15 @@ class SyncContext:
                 
         except Exception as e:
             logger.error(f"清理锁文件失败: {e}")
+        finally:
+            self.release_lock()
     
     def is_resumable(self) -> bool:
         """检查是否可以恢复同步"""
         return (
             self.status in ["fetching", "processing", "downloading"] and
             (self.collections_to_process or self.fetched_collections or 
-             self.processed_collections or self.current_collection)
+             self.processed_collections)
         )
     
     def get_progress_info(self) -> Dict[str, Any]:
@@ -358,8 +489,6 @@ class SyncContext:
                            len(self.fetched_collections) +
                            len(self.processed_collections) + 
                            len(self.downloaded_collections))
-        if self.current_collection:
-            total_collections += 1
         
         return {
             "task_id": self.task_id,
@@ -370,8 +499,12 @@ class SyncContext:
             "processed_collections": len(self.processed_collections),
             "downloaded_collections": len(self.downloaded_collections),
             "failed_collections": len(self.failed_collections),
-            "current_collection": self.current_collection.get('title') if self.current_collection else None,
-            "current_page": self.current_page,
+            # 已开始获取但尚未完成的收藏夹及其已保存的页数
+            "fetching_collections": {
+                collection["title"]: self.fetched_pages[collection_id]
+                for collection_id, collection in self.collections_to_process.items()
+                if collection_id in self.fetched_pages
+            },
             "stats": self.stats,
             "created_at": self.created_at,
             "updated_at": self.updated_at
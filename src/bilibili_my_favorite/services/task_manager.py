@@ -32,6 +32,9 @@ class TaskManager:
             return
         
         try:
+            # 预加载活跃任务，调度轮询不再每次查询数据库
+            await task_dao.warm_cache()
+            
             # 启动任务执行器（表创建已移到init_db命令中）
             task_executor.start()
             
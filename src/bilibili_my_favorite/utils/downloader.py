@@ -14,11 +14,32 @@ from bilibili_api import video, Credential, get_client
 
 
 class CoverDownloader:
-    """封面图片下载器"""
+    """封面图片下载器，同一事件循环内复用一个带连接池的HTTP客户端"""
     
     def __init__(self):
         self.timeout = config.DOWNLOAD_TIMEOUT
         self.covers_dir = config.COVERS_DIR
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环的HTTP客户端，保持长连接以免每张封面都重新握手"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # 客户端的连接池绑定在创建它的事件循环上，换了事件循环需要新建
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            )
+            self._client_loop = loop
+        return self._client
+    
+    async def close(self):
+        """关闭当前事件循环的HTTP客户端"""
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
         
     async def download_cover(self, bvid: str, cover_url: str) -> Optional[str]:
         """
@@ -47,16 +68,15 @@ class CoverDownloader:
         self.covers_dir.mkdir(exist_ok=True)
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(cover_url, timeout=self.timeout)
-                response.raise_for_status()
-                
-                # 保存文件
-                with open(local_path, "wb") as f:
-                    f.write(response.content)
-                
-                logger.info(f"成功下载封面: BVID {bvid} -> {local_path}")
-                return str(local_path)
+            response = await self._get_client().get(cover_url)
+            response.raise_for_status()
+            
+            # 保存文件
+            with open(local_path, "wb") as f:
+                f.write(response.content)
+            
+            logger.info(f"成功下载封面: BVID {bvid} -> {local_path}")
+            return str(local_path)
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP错误下载封面: BVID {bvid}, URL {cover_url}, "
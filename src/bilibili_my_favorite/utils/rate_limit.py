@@ -0,0 +1,43 @@
+"""
+限流工具模块
+提供令牌桶限流器
+"""
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """令牌桶限流器：按固定速率补充令牌，最多积累 capacity 个，允许短时突发
+
+    jitter 大于 0 时每次实际消耗的令牌数在 [1 - jitter, 1 + jitter] 倍之间随机，
+    请求间隔围绕平均值随机波动而不是固定节拍
+    """
+
+    def __init__(self, rate: float, capacity: float = 1, jitter: float = 0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.jitter = jitter
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Web 服务和任务执行器在不同线程的事件循环中共用同一个限流器
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """预留令牌并返回需要等待的秒数；令牌不足时记为欠账，后来者排在其后"""
+        if self.jitter:
+            tokens *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    async def acquire(self, tokens: float = 1):
+        """获取令牌，不足时等待补充"""
+        # 预留在 await 之前完成，等待期间不持有锁，并发调用方依次排开
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -6,6 +6,7 @@ import asyncio
 import json
 import sys
 import traceback
+from datetime import datetime
 from typing import Optional
 import click
 from rich.console import Console
@@ -249,9 +250,9 @@ def list_videos(collection_id: int, status: str, limit: int):
             
             for video in videos:
                 status_text = "已删除" if video["is_deleted"] else "正常"
-                last_seen = video.get("last_seen", "")
-                if last_seen:
-                    last_seen = last_seen[:19]  # 只显示日期时间部分
+                last_seen = video.get("last_seen")
+                # 数据库中为秒级时间戳，显示为本地时间
+                last_seen = datetime.fromtimestamp(last_seen).strftime("%Y-%m-%d %H:%M:%S") if last_seen else ""
                 
                 table.add_row(
                     str(video["id"]),
@@ -0,0 +1,13 @@
+"""
+测试包
+导入被测模块之前，把日志、数据目录和数据库指向临时目录，测试不会写入项目目录
+
+运行: PYTHONPATH=src python -m unittest discover -s tests -t .
+"""
+import os
+import tempfile
+
+_TEMP_DIR = tempfile.mkdtemp(prefix="bilibili-favorites-test-")
+os.environ.setdefault("LOG_FILE", os.path.join(_TEMP_DIR, "test.log"))
+os.environ.setdefault("DATA_DIR", os.path.join(_TEMP_DIR, "data"))
+os.environ.setdefault("DATABASE_PATH", os.path.join(_TEMP_DIR, "test.db"))
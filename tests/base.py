@@ -0,0 +1,28 @@
+"""
+测试公共基类
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.core.db_pool import close_pool
+from bilibili_my_favorite.dao.video_dao import VideoDAO
+from bilibili_my_favorite.models import database_migration
+
+
+class DatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    """每个用例使用独立的临时数据库，用例结束时关闭当前事件循环的连接池"""
+
+    async def asyncSetUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._original_path = config.DATABASE_PATH
+        config.DATABASE_PATH = Path(self._temp_dir.name) / "test.db"
+        database_migration._up_to_date.clear()
+        VideoDAO.invalidate_cache()
+
+    async def asyncTearDown(self):
+        await close_pool()
+        config.DATABASE_PATH = self._original_path
+        database_migration._up_to_date.clear()
+        self._temp_dir.cleanup()
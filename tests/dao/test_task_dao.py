@@ -0,0 +1,80 @@
+"""
+任务数据访问层测试
+"""
+from unittest import mock
+
+import aiosqlite
+
+from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.dao.base import BaseDAO
+from bilibili_my_favorite.dao.task_dao import TaskDAO
+from bilibili_my_favorite.models.database import initialize_database
+from bilibili_my_favorite.models.task_models import BaseTask, TaskStatus
+from tests.base import DatabaseTestCase
+
+
+class TaskDAOTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await initialize_database()
+        await BaseDAO.initialize_database()
+        self.dao = TaskDAO()
+        await self.dao.warm_cache()
+
+    async def test_cached_tasks_are_copies(self):
+        task = BaseTask(title="a")
+        self.assertTrue(await self.dao.save_task(task))
+
+        # 调用方修改自己的对象或返回的对象，都不影响缓存
+        task.status = TaskStatus.RUNNING
+        listed = await self.dao.get_active_tasks()
+        self.assertEqual(listed[0].status, TaskStatus.PENDING)
+        listed[0].status = TaskStatus.FAILED
+        pending = await self.dao.get_tasks_by_status(TaskStatus.PENDING)
+        self.assertEqual([t.task_id for t in pending], [task.task_id])
+
+    async def test_failed_save_keeps_cache_consistent(self):
+        task = BaseTask(title="a")
+        await self.dao.save_task(task)
+
+        task.status = TaskStatus.RUNNING
+        with mock.patch.object(self.dao, "execute_update", side_effect=RuntimeError("disk full")):
+            self.assertFalse(await self.dao.save_task(task))
+
+        self.assertEqual(len(await self.dao.get_tasks_by_status(TaskStatus.PENDING)), 1)
+        self.assertEqual(await self.dao.get_tasks_by_status(TaskStatus.RUNNING), [])
+
+    async def test_save_updates_existing_task(self):
+        task = BaseTask(title="a")
+        await self.dao.save_task(task)
+        task.status = TaskStatus.COMPLETED
+        await self.dao.save_task(task)
+
+        self.assertEqual(await self.dao.get_active_tasks(), [])
+        stored = await self.dao.get_task_by_id(task.task_id)
+        self.assertEqual(stored.status, TaskStatus.COMPLETED)
+        self.assertEqual(int(stored.created_at.timestamp()), int(task.created_at.timestamp()))
+
+    async def test_tasks_written_by_other_process_are_visible(self):
+        self.assertEqual(await self.dao.get_active_tasks(), [])
+        async with aiosqlite.connect(config.DATABASE_PATH) as db:
+            await db.execute(
+                "INSERT INTO tasks (task_id, task_type, title, status, parameters, created_at, updated_at) "
+                "VALUES ('cli', 'video_download', 'from cli', 'pending', '{}', 1, 2)"
+            )
+            await db.commit()
+
+        pending = await self.dao.get_tasks_by_status(TaskStatus.PENDING)
+        self.assertEqual([task.task_id for task in pending], ["cli"])
+
+    async def test_nested_parameters_are_not_shared(self):
+        task = BaseTask(title="a", parameters={"videos": [{"bvid": "BV1"}]})
+        await self.dao.save_task(task)
+
+        first = await self.dao.get_task_by_id(task.task_id)
+        first.parameters["videos"].append({"bvid": "BV2"})
+        first.parameters["videos"][0]["bvid"] = "changed"
+
+        second = await self.dao.get_task_by_id(task.task_id)
+        self.assertEqual(second.parameters, {"videos": [{"bvid": "BV1"}]})
@@ -0,0 +1,151 @@
+"""
+视频数据访问层测试
+"""
+from datetime import datetime, timezone
+from unittest import mock
+
+from bilibili_my_favorite.dao.base import BaseDAO
+from bilibili_my_favorite.dao.video_dao import video_dao
+from bilibili_my_favorite.models.database import bulk_upsert_uploaders, get_uploader_map, initialize_database
+from tests.base import DatabaseTestCase
+
+
+class VideoDAOTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await initialize_database()
+        await BaseDAO.initialize_database()
+        async with video_dao.transaction() as tx:
+            await tx.execute("INSERT INTO users (mid, name) VALUES ('1', 'user')")
+            await tx.execute("INSERT INTO uploaders (mid, name) VALUES ('10', 'UP主')")
+            await tx.execute("INSERT INTO collections (bilibili_fid, title, user_mid) VALUES ('100', '默认收藏夹', '1')")
+        self.collection_id = 1
+
+    async def _add_videos(self, fav_times):
+        """按顺序添加视频并加入收藏夹，返回视频ID"""
+        video_ids = []
+        async with video_dao.transaction() as tx:
+            for n, fav_time in enumerate(fav_times, 1):
+                cursor = await tx.execute(
+                    "INSERT INTO videos (bilibili_id, bvid, title, uploader_mid) VALUES (?, ?, ?, '10')",
+                    (str(n), f"BV{n}", f"视频{n}")
+                )
+                video_ids.append(cursor.lastrowid)
+                await tx.execute(
+                    "INSERT INTO collection_videos (collection_id, video_id, fav_time, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, 0, 0)",
+                    (self.collection_id, cursor.lastrowid, fav_time)
+                )
+        return video_ids
+
+    async def test_collection_page_counts_with_window_and_fallback(self):
+        await self._add_videos([100, 300, 200, 300, 50])
+
+        page = await video_dao.get_collection_page(self.collection_id, limit=2)
+        self.assertEqual(page["total"], 5)
+        self.assertEqual([video["bvid"] for video in page["items"]], ["BV2", "BV4"])
+        self.assertNotIn("total_count", page["items"][0])
+
+        # 页码超出范围时窗口计数拿不到，单独计数
+        beyond = await video_dao.get_collection_page(self.collection_id, limit=2, offset=10)
+        self.assertEqual(beyond, {"items": [], "total": 5})
+
+        filtered = await video_dao.get_collection_page(self.collection_id, search="视频3")
+        self.assertEqual([video["bvid"] for video in filtered["items"]], ["BV3"])
+        self.assertEqual(filtered["total"], 1)
+
+    async def test_collection_page_cursor_matches_offset_order(self):
+        # 相同收藏时间按视频ID排序，收藏时间为空的排在最后
+        await self._add_videos([100, 300, None, 300, 200, None, 50])
+        expected = [video["id"] for video in await video_dao.get_videos_by_collection(self.collection_id)]
+
+        seen, cursor = [], {}
+        while True:
+            page = await video_dao.get_collection_page(self.collection_id, limit=2, **cursor)
+            self.assertEqual(page["total"], 7)
+            seen.extend(video["id"] for video in page["items"])
+            cursor = video_dao.next_cursor(page["items"], 2)
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 7)
+
+    async def test_get_videos_by_bvids_batches_lookups(self):
+        await self._add_videos([1] * 3)
+
+        with mock.patch.object(video_dao, "_BATCH_SIZE", 2):
+            videos = await video_dao.get_videos_by_bvids(["BV3", "BV1", "BV1", "BV9", "BV2"])
+
+        self.assertEqual(sorted(videos), ["BV1", "BV2", "BV3"])
+        self.assertEqual(videos["BV2"]["title"], "视频2")
+        self.assertEqual(videos["BV2"]["uploader_name"], "UP主")
+
+    async def test_timestamp_columns_store_text(self):
+        # TIMESTAMP 列显式写入文本，不经过 sqlite3 已弃用的默认 datetime 适配器
+        video_ids = await self._add_videos([1, 2])
+        videos = list((await video_dao.get_videos_by_bvids(["BV1"])).values())
+        now = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+        await video_dao.bulk_insert_video_stats([(video_ids[1], {"play": 10})], now)
+        await video_dao.bulk_remove_deleted_from_collection(self.collection_id, videos, reason="test")
+
+        stats = await video_dao.execute_query("SELECT recorded_at FROM video_stats")
+        self.assertEqual([row[0] for row in stats], ["2024-01-02 03:04:05+00:00"])
+        logs = await video_dao.execute_query("SELECT video_bvid, typeof(deleted_at) FROM deletion_logs")
+        self.assertEqual([tuple(row) for row in logs], [("BV1", "text")])
+        remaining = await video_dao.get_videos_by_collection(self.collection_id)
+        self.assertEqual([video["bvid"] for video in remaining], ["BV2"])
+
+    async def test_bulk_save_videos_inserts_and_updates(self):
+        [existing_id] = await self._add_videos([1])
+        now = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        new_videos = [
+            {"bilibili_id": str(n), "bvid": f"BV{n}", "title": f"新视频{n}", "uploader_mid": "10"}
+            for n in (2, 3)
+        ]
+
+        created = await video_dao.bulk_save_videos(
+            new_videos, [(existing_id, {"title": "改名", "is_deleted": True, "deleted_at": now})], now
+        )
+
+        videos = await video_dao.get_videos_by_bvids(["BV1", "BV2", "BV3"])
+        self.assertEqual(created, {"BV2": videos["BV2"]["id"], "BV3": videos["BV3"]["id"]})
+        self.assertEqual(videos["BV3"]["title"], "新视频3")
+        self.assertEqual(videos["BV1"]["title"], "改名")
+        self.assertTrue(videos["BV1"]["is_deleted"])
+        # 时间统一写成秒级时间戳
+        self.assertEqual(videos["BV1"]["deleted_at"], int(now.timestamp()))
+        self.assertEqual(await video_dao.bulk_save_videos([], []), {})
+
+    async def test_bulk_upsert_uploaders_only_changes_differing_rows(self):
+        await bulk_upsert_uploaders([("10", "UP主", "face", None), ("11", "新UP主", None, None)])
+        await bulk_upsert_uploaders([("11", "改名", None, "link")])
+
+        self.assertEqual(await get_uploader_map(), {
+            "10": ("10", "UP主", "face", None),
+            "11": ("11", "改名", None, "link"),
+        })
+
+    async def test_bulk_upsert_collection_videos_keeps_first_seen(self):
+        first, second = await self._add_videos([100, 200])
+        synced_at = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+        await video_dao.bulk_upsert_collection_videos(self.collection_id, [(first, 150), (second, 200)], synced_at)
+
+        rows = await video_dao.execute_query(
+            "SELECT video_id, fav_time, first_seen, last_seen FROM collection_videos ORDER BY video_id"
+        )
+        synced = int(synced_at.timestamp())
+        # 已有关系更新收藏时间和最后出现时间，首次出现时间不变
+        self.assertEqual([tuple(row) for row in rows], [(first, 150, 0, synced), (second, 200, 0, synced)])
+
+        other_collection = await video_dao.execute_insert(
+            "INSERT INTO collections (bilibili_fid, title, user_mid) VALUES ('200', '稍后再看', '1')"
+        )
+        await video_dao.bulk_upsert_collection_videos(other_collection, [(first, 300)], synced_at)
+        added = await video_dao.execute_query(
+            "SELECT first_seen FROM collection_videos WHERE collection_id = ?", (other_collection,)
+        )
+        self.assertEqual([row[0] for row in added], [synced])
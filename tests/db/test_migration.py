@@ -0,0 +1,96 @@
+"""
+数据库迁移测试
+"""
+import sqlite3
+from datetime import datetime, timezone
+
+from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.dao.base import BaseDAO
+from bilibili_my_favorite.dao.video_dao import video_dao
+from bilibili_my_favorite.models.database import SCHEMA_SQL, initialize_database
+from bilibili_my_favorite.models.database_migration import (
+    LATEST_VERSION, check_migration_needed, migrate_database
+)
+from tests.base import DatabaseTestCase
+
+
+def _create_legacy_database(path):
+    """创建迁移前（user_version = 0）的数据库，时间字段为 ISO 字符串"""
+    with sqlite3.connect(path) as db:
+        db.executescript(SCHEMA_SQL)
+        db.executescript("""
+            INSERT INTO users (mid, name) VALUES ('1', 'user');
+            INSERT INTO uploaders (mid, name) VALUES ('10', '测试UP主');
+            INSERT INTO collections (bilibili_fid, title, user_mid) VALUES ('100', '默认收藏夹', '1');
+            INSERT INTO videos (bilibili_id, bvid, title, uploader_mid, created_at, updated_at, deleted_at)
+            VALUES ('1', 'BV1xx411c7mD', '一个测试视频标题', '10',
+                    '2024-01-02 03:04:05', '2024-01-02T03:04:05+00:00', NULL);
+            INSERT INTO collection_videos (collection_id, video_id, fav_time, first_seen, last_seen, created_at, updated_at)
+            VALUES (1, 1, 1700000000, '2024-01-02 03:04:05', '2024-01-03 00:00:00',
+                    '2024-01-02 03:04:05', '2024-01-03 00:00:00');
+        """)
+    db.close()
+
+
+def _epoch(text: str) -> int:
+    return int(datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp())
+
+
+class MigrationTest(DatabaseTestCase):
+
+    async def test_new_database_is_at_latest_version(self):
+        await initialize_database()
+
+        with sqlite3.connect(config.DATABASE_PATH) as db:
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+        db.close()
+        self.assertEqual(version, LATEST_VERSION)
+        self.assertFalse(await check_migration_needed())
+        self.assertFalse(await migrate_database())
+
+    async def test_legacy_database_is_migrated(self):
+        _create_legacy_database(config.DATABASE_PATH)
+        self.assertTrue(await check_migration_needed())
+
+        self.assertTrue(await migrate_database())
+
+        with sqlite3.connect(config.DATABASE_PATH) as db:
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            video = db.execute(
+                "SELECT typeof(created_at), created_at, updated_at FROM videos WHERE id = 1"
+            ).fetchone()
+            relation = db.execute(
+                "SELECT typeof(first_seen), first_seen, last_seen FROM collection_videos WHERE id = 1"
+            ).fetchone()
+            tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        db.close()
+
+        self.assertEqual(version, LATEST_VERSION)
+        self.assertEqual(video, ("integer", _epoch("2024-01-02 03:04:05"), _epoch("2024-01-02 03:04:05")))
+        self.assertEqual(relation, ("integer", _epoch("2024-01-02 03:04:05"), _epoch("2024-01-03 00:00:00")))
+        self.assertIn("tasks", tables)
+        self.assertIn("videos_fts", tables)
+        # 已是最新版本，再次执行不做任何事
+        self.assertFalse(await check_migration_needed())
+        self.assertFalse(await migrate_database())
+
+    async def test_trigram_search_after_migration(self):
+        _create_legacy_database(config.DATABASE_PATH)
+        with sqlite3.connect(config.DATABASE_PATH) as db:
+            db.executemany(
+                "INSERT INTO videos (bilibili_id, bvid, title, uploader_mid) VALUES (?, ?, ?, '10')",
+                [(str(i), f"BV{i}", f"其他视频{i}") for i in range(2, 6)]
+            )
+            db.executemany(
+                "INSERT INTO collection_videos (collection_id, video_id, fav_time, first_seen, last_seen) "
+                "VALUES (1, ?, ?, 0, 0)",
+                [(i, 1700000000 - i) for i in range(2, 6)]
+            )
+        db.close()
+        await BaseDAO.initialize_database()
+
+        # 中文子串检索走 trigram 全文索引，UP主名也会被检索
+        found = await video_dao.get_videos_by_collection(1, search="测试视频")
+        self.assertEqual([video["bvid"] for video in found], ["BV1xx411c7mD"])
+        by_uploader = await video_dao.get_videos_by_collection(1, search="测试UP主")
+        self.assertEqual(len(by_uploader), 5)
@@ -0,0 +1,85 @@
+"""
+连接池与事务测试
+"""
+import asyncio
+import sqlite3
+import threading
+from unittest import mock
+
+from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.core.db_pool import close_pool, get_pool
+from bilibili_my_favorite.dao.base import BaseDAO
+from bilibili_my_favorite.dao.video_dao import video_dao
+from bilibili_my_favorite.models.database import get_or_create_collection, get_or_create_user, initialize_database
+from tests.base import DatabaseTestCase
+
+
+class PoolTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await initialize_database()
+        await BaseDAO.initialize_database()
+
+    async def test_failed_helper_rolls_back_writer(self):
+        # title 为空违反 NOT NULL，失败后写连接不能停留在未结束的事务中
+        with self.assertRaises(sqlite3.IntegrityError):
+            await get_or_create_collection("100", None, "1")
+
+        pool = await get_pool()
+        self.assertFalse(pool.writer.in_transaction)
+        async with video_dao.transaction() as tx:
+            await tx.execute("INSERT INTO users (mid, name) VALUES ('2', 'other')")
+        self.assertIsNotNone(await get_or_create_user("1", "user"))
+
+    async def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            async with video_dao.transaction() as tx:
+                await tx.execute("INSERT INTO uploaders (mid, name) VALUES ('10', 'up')")
+                raise RuntimeError("boom")
+
+        self.assertEqual(await video_dao.execute_query("SELECT mid FROM uploaders"), [])
+        async with video_dao.transaction() as tx:
+            await tx.execute("INSERT INTO uploaders (mid, name) VALUES ('10', 'up')")
+        self.assertEqual([tuple(row) for row in await video_dao.execute_query("SELECT mid FROM uploaders")], [("10",)])
+
+    async def test_readers_are_read_only(self):
+        pool = await get_pool()
+        self.assertTrue(pool.readers)
+        async with pool.acquire_reader() as reader:
+            with self.assertRaises(sqlite3.OperationalError):
+                await reader.execute("INSERT INTO users (mid, name) VALUES ('3', 'x')")
+
+    async def test_writes_from_another_event_loop_wait_for_busy_lock(self):
+        # 任务执行器线程的事件循环有自己的连接池，写锁不互斥，由 busy_timeout 等待对方提交
+        locked, done = threading.Event(), threading.Event()
+
+        async def hold_write_lock():
+            pool = await get_pool()
+            await pool.writer.execute("BEGIN IMMEDIATE")
+            await pool.writer.execute("INSERT INTO users (mid, name) VALUES ('2', 'other loop')")
+            locked.set()
+            await asyncio.sleep(0.5)
+            await pool.writer.commit()
+            await close_pool()
+
+        def run_other_loop():
+            try:
+                asyncio.run(hold_write_lock())
+            finally:
+                done.set()
+
+        with mock.patch.object(config, "DB_BUSY_TIMEOUT_MS", 5000):
+            await close_pool()
+            threading.Thread(target=run_other_loop).start()
+            self.assertTrue(await asyncio.to_thread(locked.wait, 5))
+            pool = await get_pool()
+            busy_timeout = await pool.writer.execute_fetchall("PRAGMA busy_timeout")
+            self.assertEqual(busy_timeout[0][0], 5000)
+
+            async with video_dao.transaction() as tx:
+                await tx.execute("INSERT INTO users (mid, name) VALUES ('3', 'this loop')")
+            await asyncio.to_thread(done.wait, 5)
+
+        rows = await video_dao.execute_query("SELECT mid FROM users WHERE mid IN ('2', '3') ORDER BY mid")
+        self.assertEqual([row[0] for row in rows], ["2", "3"])
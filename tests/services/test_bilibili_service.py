@@ -0,0 +1,79 @@
+"""
+B站接口调用的重试测试
+"""
+import types
+import unittest
+from unittest import mock
+
+from bilibili_my_favorite.core.config import config
+
+try:
+    from bilibili_api.exceptions import NetworkException, ResponseCodeException
+    from bilibili_my_favorite.services.bilibili_service import BilibiliService
+except ImportError:  # 未安装 bilibili-api-python
+    BilibiliService = None
+
+
+@unittest.skipIf(BilibiliService is None, "需要安装 bilibili-api-python")
+class CallApiRetryTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.service = BilibiliService()
+        self.service.rate_limiter = mock.AsyncMock()
+        self.delays = []
+        patcher = mock.patch("bilibili_my_favorite.services.bilibili_service.asyncio.sleep", self._sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _sleep(self, delay):
+        self.delays.append(delay)
+
+    def _api(self, *errors):
+        """依次抛出给定的错误，之后返回 "ok"，记录调用次数"""
+        pending = list(errors)
+
+        async def api():
+            api.calls += 1
+            if pending:
+                raise pending.pop(0)
+            return "ok"
+
+        api.calls = 0
+        return api
+
+    async def test_retries_rate_limits_with_exponential_backoff(self):
+        api = self._api(ResponseCodeException(-412, "请求被拦截"), NetworkException(503, "unavailable"))
+
+        with mock.patch.object(config, "API_RETRY_BASE_DELAY", 1.0):
+            self.assertEqual(await self.service.call_api(api), "ok")
+
+        self.assertEqual(api.calls, 3)
+        self.assertEqual(self.service.rate_limiter.acquire.await_count, 3)
+        # 第 n 次重试等待 1 * 2^n 秒，外加不超过 0.1 秒的抖动
+        self.assertEqual(len(self.delays), 2)
+        for attempt, delay in enumerate(self.delays):
+            self.assertGreaterEqual(delay, 2 ** attempt)
+            self.assertLess(delay, 2 ** attempt + 0.1)
+
+    async def test_retry_after_header_overrides_backoff(self):
+        error = NetworkException(429, "too many requests")
+        error.response = types.SimpleNamespace(headers={"Retry-After": "7"})
+
+        self.assertEqual(await self.service.call_api(self._api(error)), "ok")
+        self.assertEqual(self.delays, [7.0])
+
+    async def test_non_retryable_errors_raise_immediately(self):
+        api = self._api(ResponseCodeException(-404, "不存在"))
+
+        with self.assertRaises(ResponseCodeException):
+            await self.service.call_api(api)
+        self.assertEqual(api.calls, 1)
+        self.assertEqual(self.delays, [])
+
+    async def test_gives_up_after_max_retries(self):
+        api = self._api(*(ConnectionError("reset") for _ in range(3)))
+
+        with mock.patch.object(config, "API_MAX_RETRIES", 2), self.assertRaises(ConnectionError):
+            await self.service.call_api(api)
+        self.assertEqual(api.calls, 2)
+        self.assertEqual(len(self.delays), 1)
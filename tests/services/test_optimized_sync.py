@@ -0,0 +1,166 @@
+"""
+同步流程测试：完整同步、增量同步和中断恢复后的失效标记
+"""
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.dao.video_dao import video_dao
+from bilibili_my_favorite.models.database import initialize_database
+from bilibili_my_favorite.services.sync_context import SyncContext, collections_by_id
+from tests.base import DatabaseTestCase
+
+try:
+    from bilibili_my_favorite.services.bilibili_service import bilibili_service
+    from bilibili_my_favorite.services.optimized_sync_service import OptimizedSyncService
+except ImportError:  # 未安装 bilibili-api-python、httpx
+    OptimizedSyncService = None
+
+FID = "100"
+PAGE_SIZE = 2
+
+
+def _video(n: int) -> dict:
+    return {
+        "id": n, "bv_id": f"BV{n}", "title": f"视频{n}", "fav_time": 1000 + n,
+        "upper": {"mid": 1, "name": "UP主"}, "cover": "",
+    }
+
+
+class FakeFavorites:
+    """按收藏时间倒序分页返回收藏夹内容，记录请求过的页码"""
+
+    def __init__(self, *numbers: int):
+        self.videos = {n: _video(n) for n in numbers}
+        self.pages = []
+
+    @property
+    def collection(self) -> dict:
+        return {"id": int(FID), "title": "默认收藏夹", "media_count": len(self.videos)}
+
+    async def call_api(self, func, media_id: int, page: int, credential=None):
+        self.pages.append(page)
+        ordered = sorted(self.videos.values(), key=lambda video: video["fav_time"], reverse=True)
+        start = (page - 1) * PAGE_SIZE
+        return {"medias": ordered[start:start + PAGE_SIZE], "has_more": start + PAGE_SIZE < len(ordered)}
+
+
+@unittest.skipIf(OptimizedSyncService is None, "需要安装 bilibili-api-python 和 httpx")
+class OptimizedSyncTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.api = FakeFavorites(1, 2, 3)
+        for patcher in (
+            mock.patch.object(bilibili_service, "call_api", self.api.call_api),
+            mock.patch.object(bilibili_service, "get_favorite_lists", self._get_favorite_lists),
+            mock.patch.object(config, "USER_DEDE_USER_ID", "1"),
+            mock.patch.object(config, "SYNC_INCREMENTAL", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await super().asyncTearDown()
+        shutil.rmtree(Path(config.DATA_DIR), ignore_errors=True)
+
+    async def _get_favorite_lists(self, uid=None):
+        return [self.api.collection]
+
+    async def _sync(self, resume_task_id: str = None) -> dict:
+        self.api.pages.clear()
+        stats = await OptimizedSyncService().sync_all_favorites(uid="1", resume_task_id=resume_task_id)
+        self.assertEqual(stats["errors"], [])
+        return stats
+
+    async def _deletion_state(self) -> dict:
+        rows = await video_dao.execute_query("SELECT bvid, is_deleted FROM videos ORDER BY bvid")
+        return {row[0]: bool(row[1]) for row in rows}
+
+    async def _interrupted_sync(self, fetched_pages: int = 0, **cursors: int) -> str:
+        """留下一个在获取阶段中断的同步任务的锁文件，fetched_pages 为中断前已保存的页数"""
+        context = SyncContext()
+        context.collections_to_process = collections_by_id([self.api.collection])
+        context.fav_time_cursors.update(cursors)
+        for page in range(1, fetched_pages + 1):
+            start = (page - 1) * PAGE_SIZE
+            ordered = sorted(self.api.videos.values(), key=lambda video: video["fav_time"], reverse=True)
+            context.save_collection_page_data(FID, page, ordered[start:start + PAGE_SIZE])
+        if fetched_pages:
+            context.update_fetched_page(FID, fetched_pages)
+        context.update_status("fetching")
+        context.close()
+        return context.task_id
+
+    async def test_full_sync_marks_removed_videos(self):
+        await self._sync()
+        del self.api.videos[2]
+
+        stats = await self._sync()
+
+        self.assertEqual(stats["videos_deleted"], 1)
+        self.assertEqual(await self._deletion_state(), {"BV1": False, "BV2": True, "BV3": False})
+
+    async def test_incremental_sync_defers_deletions_to_the_periodic_full_sync(self):
+        config.SYNC_INCREMENTAL = True
+        # 从未完整同步过的收藏夹先完整同步
+        await self._sync()
+        self.assertEqual(self.api.pages, [1, 2])
+
+        del self.api.videos[1]
+        self.api.videos[9] = _video(9)
+        await self._sync()
+        # 第1页已包含库中最新的收藏时间，不再请求更早的分页，也不判断取消收藏
+        self.assertEqual(self.api.pages, [1])
+        self.assertEqual(await self._deletion_state(), {"BV1": False, "BV2": False, "BV3": False, "BV9": False})
+
+        # 距上次完整同步超过间隔后重新完整同步，标记取消收藏的视频
+        await video_dao.execute_update(
+            "UPDATE collections SET last_full_sync = last_full_sync - ?",
+            ((config.SYNC_FULL_INTERVAL_DAYS + 1) * 86400,)
+        )
+        stats = await self._sync()
+        self.assertEqual(self.api.pages, [1, 2])
+        self.assertEqual(stats["videos_deleted"], 1)
+        self.assertEqual(await self._deletion_state(), {"BV1": True, "BV2": False, "BV3": False, "BV9": False})
+
+    async def test_resume_without_incremental_fetches_everything(self):
+        await self._sync()
+        del self.api.videos[2]
+        self.api.videos[4] = _video(4)
+        task_id = await self._interrupted_sync()
+
+        stats = await self._sync(resume_task_id=task_id)
+
+        # 没有开启增量同步，恢复时仍获取全部分页并标记取消收藏的视频
+        self.assertEqual(sorted(self.api.pages), [1, 2])
+        self.assertEqual(stats["videos_deleted"], 1)
+        self.assertEqual(await self._deletion_state(), {"BV1": False, "BV2": True, "BV3": False, "BV4": False})
+
+    async def test_resume_continues_from_the_collections_own_page(self):
+        await initialize_database()
+        self.api.videos.update({n: _video(n) for n in (4, 5)})
+        task_id = await self._interrupted_sync(fetched_pages=2)
+
+        stats = await self._sync(resume_task_id=task_id)
+
+        # 已保存的前两页不再请求
+        self.assertEqual(self.api.pages, [3])
+        self.assertEqual(stats["videos_added"], 5)
+
+    async def test_resume_keeps_the_recorded_incremental_cursor(self):
+        await self._sync()
+        del self.api.videos[1]
+        self.api.videos[4] = _video(4)
+        self.api.videos[5] = _video(5)
+        # 中断前记录的游标是获取前库中最新的收藏时间
+        task_id = await self._interrupted_sync(**{FID: 1003})
+
+        stats = await self._sync(resume_task_id=task_id)
+
+        self.assertEqual(self.api.pages, [1, 2])
+        self.assertEqual(stats["videos_added"], 2)
+        self.assertEqual(stats["videos_deleted"], 0)
+        self.assertEqual(await self._deletion_state(), {"BV1": False, "BV2": False, "BV3": False, "BV4": False, "BV5": False})
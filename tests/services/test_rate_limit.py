@@ -0,0 +1,45 @@
+"""
+令牌桶限流器测试
+"""
+import threading
+import unittest
+from unittest import mock
+
+from bilibili_my_favorite.utils.rate_limit import TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_jitter_keeps_intervals_between_min_and_max(self):
+        # 与 BilibiliService 相同的换算：间隔在 0.5 ~ 3 秒之间随机
+        min_delay, max_delay = 500, 3000
+        bucket = TokenBucket(
+            rate=2000 / (min_delay + max_delay), capacity=1,
+            jitter=(max_delay - min_delay) / (max_delay + min_delay)
+        )
+        # 冻结时钟，每次预留的等待时间之差就是相邻请求的间隔
+        with mock.patch("bilibili_my_favorite.utils.rate_limit.time.monotonic", return_value=0.0):
+            bucket._updated = 0.0
+            waits = [bucket._reserve(1) for _ in range(200)]
+
+        intervals = [b - a for a, b in zip(waits[1:], waits[2:])]
+        self.assertGreaterEqual(min(intervals), 0.5 - 1e-9)
+        self.assertLessEqual(max(intervals), 3.0 + 1e-9)
+        self.assertAlmostEqual(sum(intervals) / len(intervals), 1.75, delta=0.25)
+
+    def test_reservations_from_threads_are_not_lost(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        with mock.patch("bilibili_my_favorite.utils.rate_limit.time.monotonic", return_value=0.0):
+            bucket._updated = 0.0
+
+            def reserve_many():
+                for _ in range(500):
+                    bucket._reserve(1)
+
+            threads = [threading.Thread(target=reserve_many) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(bucket._tokens, 1 - 8 * 500)
@@ -0,0 +1,83 @@
+"""
+同步上下文测试
+"""
+import json
+import shutil
+import unittest
+from pathlib import Path
+
+from bilibili_my_favorite.core.config import config
+from bilibili_my_favorite.services.sync_context import SyncContext, collections_by_id
+
+
+class SyncContextTest(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        shutil.rmtree(Path(config.DATA_DIR), ignore_errors=True)
+
+    async def test_close_writes_pending_debounced_save(self):
+        context = SyncContext()
+        context.save_lock_file()
+        context.update_fetched_page("1", 7)
+
+        context.close()
+
+        self.assertEqual(json.loads(context.lock_file_path.read_text())["fetched_pages"], {"1": 7})
+        context.cleanup()
+        self.assertFalse(context.lock_file_path.exists())
+
+    def test_lock_file_round_trip(self):
+        context = SyncContext()
+        context.collections_to_process = collections_by_id([{"id": 1, "title": "a"}, {"id": 2, "title": "b"}])
+        context.fav_time_cursors["1"] = 100
+        context.update_fetched_page("1", 3)
+        context.update_fetched_page("2", 5)
+        context.mark_collection_data_fetched("2")
+        context.close()
+
+        loaded = SyncContext.load_from_lock_file(str(context.lock_file_path))
+        self.assertEqual(loaded.task_id, context.task_id)
+        self.assertEqual(list(loaded.collections_to_process), ["1"])
+        self.assertEqual(list(loaded.fetched_collections), ["2"])
+        self.assertEqual(loaded.fav_time_cursors, {"1": 100})
+        # 获取完成的收藏夹不再保留分页进度
+        self.assertEqual(loaded.fetched_pages, {"1": 3})
+        self.assertEqual(loaded.get_progress_info()["fetching_collections"], {"a": 3})
+        context.cleanup()
+
+    def test_legacy_lock_file_resumes_current_collection(self):
+        context = SyncContext()
+        context.collections_to_process = collections_by_id([{"id": 1, "title": "a"}])
+        lock_data = context._snapshot()
+        del lock_data["fetched_pages"]
+        lock_data.update(current_collection={"id": 2, "title": "b"}, current_page=4)
+        context.lock_file_path.parent.mkdir(parents=True, exist_ok=True)
+        context.lock_file_path.write_text(json.dumps(lock_data), encoding="utf-8")
+
+        loaded = SyncContext.load_from_lock_file(str(context.lock_file_path))
+        self.assertEqual(list(loaded.collections_to_process), ["1", "2"])
+        self.assertEqual(loaded.fetched_pages, {"2": 3})
+        context.cleanup()
+
+    def test_page_data_round_trip(self):
+        context = SyncContext()
+        pages = [[{"bv_id": f"BV{page}_{i}", "title": "视频"} for i in range(3)] for page in range(1, 4)]
+        for page, data in enumerate(pages, 1):
+            context.save_collection_page_data("1", page, data)
+
+        self.assertTrue(context.has_collection_page_data("1", 2))
+        self.assertEqual(context.load_collection_page_data("1", 3), pages[2])
+        self.assertEqual(list(context.iter_collection_all_videos("1")), [v for page in pages for v in page])
+        self.assertEqual(context.get_collection_all_videos("1"), [v for page in pages for v in page])
+        context.cleanup()
+
+    def test_only_one_sync_holds_the_lock(self):
+        first, second = SyncContext(), SyncContext()
+        first.acquire_lock()
+        try:
+            with self.assertRaises(RuntimeError):
+                second.acquire_lock()
+        finally:
+            first.release_lock()
+        second.acquire_lock()
+        second.release_lock()